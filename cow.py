@@ -0,0 +1,370 @@
+import numpy as np
+
+BAND_ROWS = 32
+
+
+class BandedGrid:
+    """
+        2D int32 grid of (n_row, n_col) cells, split into horizontal bands of 'band_rows' rows.
+
+        Copies of the grid share all bands; a band is copied only on the first write
+        to it after the copy (copy-on-write). Thus, the cost of a copy followed by
+        a local change depends on the size of the change and not on the size of the grid.
+
+            bands, list[np.array of int32]
+        bands of the grid, bands[b] holds rows [b * band_rows, (b+1) * band_rows)
+
+            owned, list[bool]
+        owned[b] is True if bands[b] is not shared with any other grid and can be written in place
+    """
+    def __init__(self, n_row, n_col, value=-1, band_rows=BAND_ROWS):
+        self.n_row = n_row
+        self.n_col = n_col
+        self.band_rows = band_rows
+        self.bands = []
+        for y in range(0, n_row, band_rows):
+            self.bands.append(np.full((min(band_rows, n_row - y), n_col), value, dtype=np.int32))
+        self.owned = [True] * len(self.bands)
+
+
+    @classmethod
+    def from_array(cls, arr, band_rows=BAND_ROWS):
+        """
+            Creates the grid from a full (n_row, n_col) array; the bands are views of 'arr'
+        """
+        grid = cls.__new__(cls)
+        grid.n_row, grid.n_col = arr.shape
+        grid.band_rows = band_rows
+        grid.bands = [arr[y:y + band_rows] for y in range(0, grid.n_row, band_rows)]
+        grid.owned = [True] * len(grid.bands)
+        return grid
+
+
+    def copy(self):
+        other = BandedGrid.__new__(BandedGrid)
+        other.__dict__.update(self.__dict__)
+        other.bands = list(self.bands)
+        self.owned = [False] * len(self.bands)
+        other.owned = [False] * len(self.bands)
+        return other
+
+
+    def __getitem__(self, pos):
+        y, x = pos
+        return self.bands[y // self.band_rows][y % self.band_rows, x]
+
+
+    def region_max(self, x, y, wi, he):
+        """
+            Returns the maximum value in the rectangle (wi, he) with the upper left cell at (x, y)
+        """
+        return max(self.bands[b][y0:y1, x:x + wi].max() for b, y0, y1 in self.__split(y, he))
+
+
+    def window(self, x, y, wi, he):
+        """
+            Returns the copy of the rectangle (wi, he) with the upper left cell at (x, y) as a single array
+        """
+        return np.vstack([self.bands[b][y0:y1, x:x + wi] for b, y0, y1 in self.__split(y, he)])
+
+
+    def fill(self, x, y, wi, he, value):
+        """
+            Sets all cells of the rectangle (wi, he) with the upper left cell at (x, y) to 'value'
+        """
+        for b, y0, y1 in self.__split(y, he):
+            if not self.owned[b]:
+                self.bands[b] = self.bands[b].copy()
+                self.owned[b] = True
+            self.bands[b][y0:y1, x:x + wi] = value
+
+
+    def find(self, value):
+        """
+            Returns arrays (ys, xs) of all cells equal to 'value'
+        """
+        ys, xs = [], []
+        for b, band in enumerate(self.bands):
+            _ys, _xs = np.nonzero(band == value)
+            ys.append(_ys + b * self.band_rows)
+            xs.append(_xs)
+        return np.concatenate(ys), np.concatenate(xs)
+
+
+    def to_array(self):
+        """
+            Returns the full (n_row, n_col) grid as a single array
+        """
+        return np.vstack(self.bands)
+
+
+    ###########################################################################
+
+    def __split(self, y, he):
+        """
+            Splits the rows [y, y+he) into parts that belong to the same band.
+            Yields (b, y0, y1) -- band index and the rows range [y0, y1) inside that band.
+        """
+        R = self.band_rows
+        for b in range(y // R, (y + he - 1) // R + 1):
+            yield b, max(y - b * R, 0), min(y + he - b * R, R)
+
+
+class BandedLayout:
+    """
+        Layout dict {(x, y): k} split into bands by the row y of the slice upper left cell.
+
+        Copies of the layout share all bands; a band is copied only on the first write
+        to it after the copy (copy-on-write), the same way as in 'BandedGrid'.
+        'to_arrays' caches the arrays of each band until the band is written to,
+        so a copy with a few changed bands converts only those.
+    """
+    def __init__(self, n_row, band_rows=BAND_ROWS):
+        self.band_rows = band_rows
+        self.bands = [{} for _ in range(0, n_row, band_rows)]
+        self.owned = [True] * len(self.bands)
+        self.arrays = [None] * len(self.bands)
+        self.n = 0
+
+
+    @classmethod
+    def from_arrays(cls, n_row, x, y, k, band_rows=BAND_ROWS):
+        """
+            Creates the layout from arrays of slice positions (x, y) and slice indices k
+        """
+        layout = cls(n_row, band_rows)
+        b = y // band_rows
+        for i in np.unique(b).tolist():
+            sel = b == i
+            xs, ys, ks = x[sel].astype(np.int32), y[sel].astype(np.int32), k[sel].astype(np.int32)
+            layout.bands[i] = dict(zip(zip(xs.tolist(), ys.tolist()), ks.tolist()))
+            layout.arrays[i] = (xs, ys, ks)
+        layout.n = len(k)
+        return layout
+
+
+    def to_arrays(self):
+        """
+            Returns the layout as three int32 arrays (x, y, k), in the order of iteration over the layout
+        """
+        for i, band in enumerate(self.bands):
+            if self.arrays[i] is None:
+                xy = np.array(list(band), dtype=np.int32).reshape(-1, 2)
+                self.arrays[i] = (xy[:, 0].copy(), xy[:, 1].copy(), np.array(list(band.values()), dtype=np.int32))
+        x, y, k = [np.concatenate(a) for a in zip(*self.arrays)]
+        return x, y, k
+
+
+    def copy(self):
+        other = BandedLayout.__new__(BandedLayout)
+        other.__dict__.update(self.__dict__)
+        other.bands = list(self.bands)
+        other.arrays = list(self.arrays)
+        self.owned = [False] * len(self.bands)
+        other.owned = [False] * len(self.bands)
+        return other
+
+
+    def __getitem__(self, pos):
+        return self.bands[pos[1] // self.band_rows][pos]
+
+
+    def __setitem__(self, pos, k):
+        band = self.__writable(pos[1] // self.band_rows)
+        if not pos in band:
+            self.n += 1
+        band[pos] = k
+
+
+    def pop(self, pos):
+        k = self.__writable(pos[1] // self.band_rows).pop(pos)
+        self.n -= 1
+        return k
+
+
+    def get(self, pos, default=None):
+        return self.bands[pos[1] // self.band_rows].get(pos, default)
+
+
+    def __contains__(self, pos):
+        return pos in self.bands[pos[1] // self.band_rows]
+
+
+    def __len__(self):
+        return self.n
+
+
+    def __iter__(self):
+        for band in self.bands:
+            yield from band
+
+
+    def keys(self):
+        return iter(self)
+
+
+    def values(self):
+        for band in self.bands:
+            yield from band.values()
+
+
+    def items(self):
+        for band in self.bands:
+            yield from band.items()
+
+
+    def __eq__(self, other):
+        return dict(self.items()) == dict(other.items())
+
+
+    def diff(self, other):
+        """
+            Returns the changes that turn the layout 'other' into this layout:
+            removed -- list of (x, y) of slices that are only in 'other'
+            added -- list of ((x, y), k) of slices that are only in this layout
+            Both layouts are assumed to be copies of each other, so only the bands
+            that are not shared between them are compared.
+        """
+        removed, added = [], []
+        for a, b in zip(self.bands, other.bands):
+            if a is b:
+                continue
+            removed += [pos for pos, k in b.items() if a.get(pos) != k]
+            added += [(pos, k) for pos, k in a.items() if b.get(pos) != k]
+        return removed, added
+
+
+    ###########################################################################
+
+    def __writable(self, b):
+        self.arrays[b] = None
+        if not self.owned[b]:
+            self.bands[b] = dict(self.bands[b])
+            self.owned[b] = True
+        return self.bands[b]
+
+
+class BandedIndex:
+    """
+        Set of grid cells with addition and removal of rectangles and uniform random sampling in O(log(n_row / band_rows)).
+
+        Cells are split into bands by their row y. Each band keeps its cells, encoded as x + y * n_col,
+        in a list and a dict {cell: position in the list}; a cell is removed by swapping it with
+        the last cell of the list. Bands are shared copy-on-write between copies, the same way as in 'BandedGrid'.
+        The numbers of cells in the bands are kept in a Fenwick tree, so that 'sample' finds the band
+        of a random cell without scanning all bands.
+    """
+    def __init__(self, n_row, n_col, xs, ys, band_rows=BAND_ROWS):
+        self.n_col = n_col
+        self.band_rows = band_rows
+        self.cells = [[] for _ in range(0, n_row, band_rows)]
+        self.pos = [{} for _ in range(0, n_row, band_rows)]
+        self.owned = [True] * len(self.cells)
+        self.n = len(xs)
+
+        b = ys // band_rows
+        c = xs + ys * n_col
+        for i in np.unique(b).tolist():
+            self.cells[i] = c[b == i].tolist()
+            self.pos[i] = {cell: j for j, cell in enumerate(self.cells[i])}
+
+        # tree[i] is the number of cells in the bands (i - (i & -i), i], 1-based
+        self.tree = [0] + [len(cells) for cells in self.cells]
+        for i in range(1, len(self.tree)):
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+
+
+    def copy(self):
+        other = BandedIndex.__new__(BandedIndex)
+        other.__dict__.update(self.__dict__)
+        other.cells = list(self.cells)
+        other.pos = list(self.pos)
+        other.tree = list(self.tree)
+        self.owned = [False] * len(self.cells)
+        other.owned = [False] * len(self.cells)
+        return other
+
+
+    def __len__(self):
+        return self.n
+
+
+    def add_rect(self, x, y, wi, he):
+        """
+            Adds all cells of the rectangle (wi, he) with the upper left cell at (x, y)
+        """
+        for b, y0, y1 in self.__split(y, he):
+            b = self.__writable(b)
+            cells, pos = self.cells[b], self.pos[b]
+            for j in range(y0, y1):
+                for cell in range(x + j * self.n_col, x + wi + j * self.n_col):
+                    pos[cell] = len(cells)
+                    cells.append(cell)
+            self.__count(b, (y1 - y0) * wi)
+        self.n += wi * he
+
+
+    def remove_rect(self, x, y, wi, he):
+        """
+            Removes all cells of the rectangle (wi, he) with the upper left cell at (x, y)
+        """
+        for b, y0, y1 in self.__split(y, he):
+            b = self.__writable(b)
+            cells, pos = self.cells[b], self.pos[b]
+            for j in range(y0, y1):
+                for cell in range(x + j * self.n_col, x + wi + j * self.n_col):
+                    k = pos.pop(cell)
+                    last = cells.pop()
+                    if k < len(cells):
+                        cells[k] = last
+                        pos[last] = k
+            self.__count(b, -(y1 - y0) * wi)
+        self.n -= wi * he
+
+
+    def sample(self, rng):
+        """
+            Returns a uniformly random cell (x, y) of the set, using the random generator 'rng'
+        """
+        r = rng.randrange(self.n)
+        # Descends the Fenwick tree to the first band whose cumulative count exceeds r
+        b, step = 0, 1 << (len(self.cells).bit_length() - 1)
+        while step:
+            if b + step < len(self.tree) and self.tree[b + step] <= r:
+                b += step
+                r -= self.tree[b]
+            step >>= 1
+        y, x = divmod(self.cells[b][r], self.n_col)
+        return x, y
+
+
+    ###########################################################################
+
+    def __split(self, y, he):
+        """
+            Splits the rows [y, y+he) into parts that belong to the same band.
+            Yields (b, y0, y1) -- band index and the absolute rows range [y0, y1) inside that band.
+        """
+        while he > 0:
+            b = y // self.band_rows
+            y1 = min(y + he, (b + 1) * self.band_rows)
+            yield b, y, y1
+            he -= y1 - y
+            y = y1
+
+
+    def __count(self, b, d):
+        i = b + 1
+        while i < len(self.tree):
+            self.tree[i] += d
+            i += i & -i
+
+
+    def __writable(self, b):
+        if not self.owned[b]:
+            self.cells[b] = list(self.cells[b])
+            self.pos[b] = dict(self.pos[b])
+            self.owned[b] = True
+        return b
@@ -1,31 +1,52 @@
 import random
 import codecs
 import json
+import time
 import numpy as np
-from individual import Individual
+from individual import Individual, RECOMBINATIONS
+from pizza import read_setup
+from parallel import make_executor, make_offspring
+from population import Population
+from selection import select
+from instrument import stats, RunLog, Profiler
+from history import HistoryWriter
+from solver import window_cache
 import os
-random.seed(0)
-
-
-resume = False
-i_start = 0
-G_max = 5000
-P = 200
-c_par = 0.20
-c_rec = 0.10
-c_mut = 0.70
-c_ran = 0.00
-s = c_par + c_rec + c_mut + c_ran
-c_par /= s
-c_rec /= s
-c_mut /= s
-c_ran /= s
-
-inp_fpath = "input/d_big.in" # a_example  b_small  c_medium  d_big
-res_path = "results_big/"
-for path in [res_path, res_path+'generations_backup/', res_path+'history_best/']:
-    if not os.path.exists(path):
-        os.makedirs(path)
+import argparse
+try:
+    import tomllib
+except ImportError: # Python < 3.11
+    tomllib = None
+
+
+# Default settings of a run; a config file and command line options override them, see 'load_config'
+DEFAULTS = {
+    'input': "input/d_big.in", # a_example  b_small  c_medium  d_big
+    'res_path': "results_big/",
+    'seed': 0,
+    'workers': 0, # number of worker processes; 0 or 1 runs everything in this process
+    'resume': False, # continue from the checkpoint of generation i_start
+    'i_start': 0,
+    'G_max': 5000,
+    'time_budget': None, # seconds of wall-clock time; checked between individuals (batches of them with workers)
+    'stall_generations': None, # the run stops after this many generations without improvement of the best score
+    'target_score': None, # the run stops when the best score reaches it; None for the whole pizza
+    'P': 200,
+    'c_par': 0.20, # ratios of survivors, recombined, mutated and random individuals; normalised to sum to 1
+    'c_rec': 0.10,
+    'c_mut': 0.70,
+    'c_ran': 0.00,
+    'selection': 'truncation', # truncation  tournament  rank  sus
+    'recombination': 'quadrant', # quadrant  block  common
+    'duplicates': 'replace', # keep  drop  replace
+    'lns': 0.0, # probability that a mutation packs a window around an empty cell optimally, see 'solver.solve_region'
+    'window_cache': False, # mutations reuse the best known packings of the refilled windows, see 'Individual.fill_layout'
+    'checkpoint_every': 250, # generations between population checkpoints; 0 or None saves only the final one
+    'history': "history_best.jsonl.gz", # changes of the best layout, saved in res_path, see 'HistoryWriter'; empty to disable
+    'run_log': "run_log.csv", # per-generation timers and counters, saved in res_path as '.csv' or '.jsonl'; empty to disable
+    'profile_range': None, # (G_first, G_last) to save the cProfile profile of these generations in res_path
+    'verbose': True,
+}
 
 
 def i2s(i, d=2):
@@ -33,139 +54,357 @@ def i2s(i, d=2):
     return "0" * (d - len(res)) + res
 
 
-def read_setup(fname):
+def select_parents(population, mating_pool, n_rec, n_mut, selection=DEFAULTS['selection']):
     """
-        Reads the setup from the input file 'fname'.
-        pizza -- 2D list of pizza contents
-        n_row, n_col -- number of rows and columns in pizza
-        L -- minimum amount of each ingridient in a slice
-        H -- maximum size of a slice
-    """
-    with codecs.open(fname, 'r') as fin:
-        n_row, n_col, L, H = list(map(int, fin.readline().split()))
+        Chooses the parents of the offspring. Returns (pool, pairs, mutated):
+        pairs of indices into 'pool' for the n_rec recombinations, and indices of the n_mut mutated individuals.
 
-        pizza = []
-        for _ in range(n_row):
-            line = fin.readline().strip()
-            pizza.append(line)
+        'truncation' recombines random pairs of the mating pool and mutates only its best individual;
+        other methods draw all parents from the whole population with 'selection.select'.
+    """
+    if selection == 'truncation':
+        pairs = [random.sample(range(len(mating_pool)), 2) for _ in range(n_rec)]
+        return mating_pool, pairs, [0] * n_mut
 
-    return pizza, n_row, n_col, L, H
+    chosen = select(population.scores, 2 * n_rec + n_mut, selection).tolist()
+    pairs = list(zip(chosen[0:2 * n_rec:2], chosen[1:2 * n_rec:2]))
+    return population.individuals, pairs, chosen[2 * n_rec:]
 
 
-def generate_possible_slices(L, H):
+def remove_duplicates(population, pizza, n_min, duplicates=DEFAULTS['duplicates']):
     """
-        Generates a list of all possible slices based on L and H.
-        Each slice is encoded as (wi, he) - it's width and height, respectively.
+        Removes individuals with the same layout as an earlier individual of 'population', see 'Population.duplicates'.
+        'replace' mutates each duplicate once more and removes it only if it is still a duplicate,
+        'drop' removes duplicates right away, 'keep' returns the population unchanged.
+        Duplicates are kept if needed to leave at least n_min individuals.
     """
-    n_min = 2 * L
-    n_max = H
+    if duplicates == 'keep':
+        return population
 
-    slices = []
-    for he in range(1, n_max+1):
-        for wi in range(max(1, n_min // he), n_max + 1):
-            if he * wi > n_max:
-                break
-            slices.append((wi, he))
+    mask = population.duplicates()
+    if duplicates == 'replace' and mask.any():
+        for i in np.flatnonzero(mask):
+            population[i].mutate(pizza, random.choice([1,2,3]))
+            population.update(i)
+        mask = population.duplicates()
 
-    return slices
+    unique, repeated = np.flatnonzero(~mask), np.flatnonzero(mask)
+    return population.take(np.concatenate([unique, repeated[:max(n_min - len(unique), 0)]]))
 
 
-def make_next_generation(population, pizza):
-    mating_pool = population[:int(c_par * P)]
+def make_next_generation(population, pizza, executor=None, P=DEFAULTS['P'],
+                         c_par=DEFAULTS['c_par'], c_rec=DEFAULTS['c_rec'], c_mut=DEFAULTS['c_mut'], c_ran=DEFAULTS['c_ran'],
+                         selection=DEFAULTS['selection'], duplicates=DEFAULTS['duplicates'],
+                         recombination=DEFAULTS['recombination'], lns=DEFAULTS['lns'],
+                         window_cache=DEFAULTS['window_cache'], workers=0, deadline=None):
+    """
+        Creates the next generation of 'population' and returns it as a sorted 'Population'.
+        The int(c_par * P) best individuals survive; parents of the offspring are chosen by 'selection', see 'select_parents'.
+        Pairs of parents are recombined with the operator 'recombination', see 'individual.RECOMBINATIONS'.
+        Mutations are large neighbourhood search moves with probability 'lns', and reuse the best known packings
+        of windows if 'window_cache' is True, see 'Individual.mutate'.
+        Offspring that repeat a layout already in the generation are handled by 'duplicates', see 'remove_duplicates'.
+        The offspring are created by the 'executor' with 'workers' processes if it is given, see 'make_offspring'.
+        The settings default to 'DEFAULTS'; 'run' and the island model pass their own.
+        No more offspring are created once time.time() exceeds 'deadline', so the generation may be smaller.
+    """
+    n_min = max(int(c_par * P), 2)
+    with stats.timer('selection'):
+        mating_pool = [population[i] for i in population.top(int(c_par * P))]
+        pool, pairs, mutated = select_parents(population, mating_pool, int(c_rec * P) // 2, int(c_mut * P), selection)
+
+    if executor is not None:
+        with stats.timer('offspring'):
+            recombined, mutants, randoms = make_offspring(executor, workers, pizza, pool, pairs, mutated, int(c_ran * P), recombination, lns, window_cache, deadline)
+            next_generation = Population(mating_pool + recombined + mutants + randoms)
+    else:
+        next_generation = list(mating_pool)
+        late = lambda: deadline is not None and time.time() > deadline
+        with stats.timer('recombination'):
+            for i, j in pairs:
+                if late():
+                    break
+                C, D = RECOMBINATIONS[recombination](pool[i], pool[j], pizza)
+                next_generation += [C, D]
+
+        with stats.timer('mutation'):
+            for i in mutated:
+                if late():
+                    break
+                B = pool[i].copy()
+                levels = random.choice([1,2,3])
+                B.mutate(pizza, levels, lns=lns, cache=window_cache)
+                next_generation.append(B)
+
+        with stats.timer('random'):
+            next_generation += make_random_individuals(pizza, int(c_ran * P), deadline=deadline)
+        next_generation = Population(next_generation)
+
+    with stats.timer('duplicates'):
+        next_generation = remove_duplicates(next_generation, pizza, n_min, duplicates)
+    with stats.timer('sort'):
+        next_generation.sort()
+    return next_generation
 
-    next_generation = []
-    for _ in range(int(c_rec * P) // 2):
-        A, B = random.sample(mating_pool, 2)
-        C, D = A.recombine(B, pizza)
-        next_generation += [C, D]
 
-    next_generation += mating_pool
+def make_random_individuals(pizza, n, executor=None, workers=0, deadline=None, on_new=None):
+    """
+        Returns the list of up to n random individuals, created one by one, or in batches of 'workers'
+        by the 'executor' if it is given. 'on_new(A)' is called for each new individual.
+        No more batches are started once time.time() exceeds 'deadline'; the first one always is.
+    """
+    individuals = []
+    while len(individuals) < n:
+        if individuals and deadline is not None and time.time() > deadline:
+            break
+        if executor is not None:
+            _, _, batch = make_offspring(executor, workers, pizza, [], [], [], min(workers, n - len(individuals)))
+        else:
+            A = Individual({}, pizza.slices, pizza.n_col, pizza.n_row, pizza.L, pizza.H)
+            A.fill_layout(pizza)
+            batch = [A]
+        for A in batch:
+            if on_new is not None:
+                on_new(A)
+        individuals += batch
+    return individuals
 
-    for _ in range(int(c_mut * P)):
-        # A = random.choice(next_generation)
-        A = mating_pool[0]
-        B = A.copy()
-        levels = random.choice([1,2,3])
-        B.mutate(pizza, levels)
-        next_generation.append(B)
 
-    for _ in range(int(c_ran * P)):
-        A = Individual({}, slices, n_col, n_row, L, H)
-        A.fill_layout(pizza)
-        next_generation.append(A)
+def index_dtype(n):
+    """
+        Returns the smallest unsigned dtype that holds the indices 0..n-1
+    """
+    return np.uint8 if n <= 1 << 8 else np.uint16 if n <= 1 << 16 else np.uint32
 
-    next_generation.sort(key = lambda x: x.efficiency(), reverse=True)
-    return next_generation
 
+def save_population(population, G_n, pizza, res_path=DEFAULTS['res_path']):
+    """
+        Saves the population into the binary checkpoint 'res_path/generations_backup/G_nnnn.npz':
+            x, y, k -- arrays of all slices of all individuals, concatenated;
+                       stored as the smallest unsigned ints that hold the indices, see 'index_dtype'
+            offsets -- slices of the i-th individual are [offsets[i], offsets[i+1])
+            digest, L, H -- hash of the input pizza and its parameters, checked on load
+            rng_state, rng_gauss -- state of the 'random' module, restored on load
+    """
+    arrays = [ind.to_arrays() for ind in population]
+    offsets = np.cumsum([0] + [len(k) for _, _, k in arrays])
 
-def save_population(population, G_n):
-    res = []
-    for ind in population:
-        res.append(list(ind.layout.items()))
+    version, state, gauss = random.getstate()
+    np.savez_compressed(res_path+"generations_backup/G_%s.npz"%i2s(G_n, 4),
+        x=np.concatenate([x for x, _, _ in arrays]).astype(index_dtype(pizza.n_col)),
+        y=np.concatenate([y for _, y, _ in arrays]).astype(index_dtype(pizza.n_row)),
+        k=np.concatenate([k for _, _, k in arrays]).astype(index_dtype(len(pizza.slices))),
+        offsets=offsets, digest=pizza.digest(), L=pizza.L, H=pizza.H,
+        rng_state=np.array(state, dtype=np.uint32), rng_version=version,
+        rng_gauss=np.nan if gauss is None else gauss)
 
-    with codecs.open(res_path+"generations_backup/G_%s.json"%i2s(G_n, 4), 'w') as fout:
-        json.dump(res, fout)
 
+def load_population(fname, pizza):
+    """
+        Loads the population saved by 'save_population' and restores the state of the 'random' module.
+        Old JSON backups with lists of [[x, y], k] per individual are supported as well.
+    """
+    p = pizza
+    if fname.endswith('.json'):
+        with codecs.open(fname, 'r') as fin:
+            layouts = json.load(fin)
+
+        population = []
+        for s_list in layouts:
+            lay = np.array([[x, y, k] for (x, y), k in s_list], dtype=np.int32).reshape(-1, 3)
+            population.append(Individual.from_arrays(lay[:, 0], lay[:, 1], lay[:, 2], p.slices, p.n_col, p.n_row, p.L, p.H))
+        return population
+
+    with np.load(fname) as data:
+        if str(data['digest']) != pizza.digest():
+            raise ValueError("Checkpoint '%s' was made for another input"%fname)
+        x, y, k = data['x'].astype(np.int32), data['y'].astype(np.int32), data['k'].astype(np.int32)
+        offsets = data['offsets']
+        gauss = float(data['rng_gauss'])
+        random.setstate((int(data['rng_version']), tuple(data['rng_state'].tolist()), None if np.isnan(gauss) else gauss))
 
-def load_population(fname, slices, n_col, n_row, L, H, pizza):
     population = []
-    with codecs.open(fname, 'r') as fin:
-        layouts = json.load(fin)
-
-    for s_list in layouts:
-        _lay = {}
-        for pos, k in s_list:
-            _lay[tuple(pos)] = k
-        A = Individual(_lay, slices, n_col, n_row, L, H)
-        population.append(A)
-
+    for a, b in zip(offsets[:-1], offsets[1:]):
+        population.append(Individual.from_arrays(x[a:b], y[a:b], k[a:b], p.slices, p.n_col, p.n_row, p.L, p.H))
     return population
 
 
-pizza, n_row, n_col, L, H = read_setup(inp_fpath)
-slices = generate_possible_slices(L, H)
-
-if resume == False:
-    population = []
-    for i in range(P):
-        A = Individual({}, slices, n_col, n_row, L, H)
-        A.fill_layout(pizza)
-        population.append(A)
-    population.sort(key = lambda x: x.efficiency(), reverse=True)
-else:
-    print("Continuing previous optimization.")
-    population = load_population(res_path + "generations_backup/G_%s.json"%i2s(i_start, 4), slices, n_col, n_row, L, H, pizza)
-    print(len(population), P)
-    if len(population) < P:
-        print("Loaded population is smaller than the given max population.\nExtending it with random individuals.")
-        while len(population) < P:
-            A = Individual({}, slices, n_col, n_row, L, H)
-            A.fill_layout(pizza)
-            population.append(A)
-        population.sort(key = lambda x: x.efficiency(), reverse=True)
-    elif len(population) > P:
-        print("Loaded population is bigger than the given max population.\nRemoving the worst individuals.")
-        population.sort(key = lambda x: x.efficiency(), reverse=True)
-        population = population[:P]
-
-
-scores = []
-for i in range(i_start+1, G_max):
-    population = make_next_generation(population, pizza)
-    eff_max = population[0].efficiency()
-    scores.append((i, eff_max))
-
-    print("%s; %7.4f%%"%(i2s(i, 4), eff_max))
-    if eff_max > 99.99:
-        population[0].save_as_answer(res_path+"solution.txt")
-        break
-    population[0].dump_layout(res_path+"history_best/G_%s_i001.txt"%i2s(i, 4))
-    if i % 250 == 0:
-        save_population(population, i)
-
-save_population(population, i)
-
-with codecs.open(res_path+"opt_convergence.txt", "a") as fout:
-    for i, eff in scores:
-        fout.write("%s; %7.4f\n"%(i2s(i, 4), eff_max))
-
+def load_config(fname=None, **overrides):
+    """
+        Returns the settings of a run: 'DEFAULTS', updated with the TOML file 'fname' and then with 'overrides'.
+        Operator ratios are normalised to sum to 1. Raises ValueError for unknown settings.
+    """
+    config = dict(DEFAULTS)
+    if fname is not None:
+        if tomllib is None:
+            raise ImportError("Reading config files requires Python 3.11 or later")
+        with open(fname, 'rb') as fin:
+            config.update(tomllib.load(fin))
+    config.update(overrides)
+
+    unknown = set(config) - set(DEFAULTS)
+    if unknown:
+        raise ValueError("Unknown settings: %s" % ", ".join(sorted(unknown)))
+
+    s = sum(config[key] for key in ['c_par', 'c_rec', 'c_mut', 'c_ran'])
+    for key in ['c_par', 'c_rec', 'c_mut', 'c_ran']:
+        config[key] /= s
+    if config['profile_range'] is not None:
+        config['profile_range'] = tuple(config['profile_range'])
+    if not config['res_path'].endswith('/'):
+        config['res_path'] += '/'
+    return config
+
+
+def parse_args(argv=None):
+    """
+        Returns the settings of a run given by the command line: '--config file.toml' and one option per setting
+    """
+    parser = argparse.ArgumentParser(description="Genetic algorithm for the pizza cutting problem")
+    parser.add_argument('--config', help="TOML file with the settings, see 'DEFAULTS' in genetic.py")
+    for key, value in DEFAULTS.items():
+        if isinstance(value, bool):
+            parser.add_argument('--' + key, action=argparse.BooleanOptionalAction, default=None)
+        elif key == 'profile_range':
+            parser.add_argument('--' + key, nargs=2, type=int, metavar=('G_FIRST', 'G_LAST'))
+        elif key == 'time_budget':
+            parser.add_argument('--' + key, type=float)
+        elif key in ['stall_generations', 'target_score']:
+            parser.add_argument('--' + key, type=int)
+        else:
+            parser.add_argument('--' + key, type=type(value))
+    args = vars(parser.parse_args(argv))
+    fname = args.pop('config')
+    return load_config(fname, **{key: value for key, value in args.items() if value is not None})
+
+
+def run(config):
+    """
+        Runs the genetic algorithm with the settings 'config' (see 'load_config') and returns the best individual.
+        Results, checkpoints and logs are written into config['res_path'].
+    """
+    c = config
+    res_path = c['res_path']
+    for path in [res_path, res_path+'generations_backup/']:
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    t_start = time.time()
+    random.seed(c['seed'])
+    # Packings cached by an earlier run in this process would change the result of this one
+    window_cache.clear()
+    settings = {key: c[key] for key in ['P', 'c_par', 'c_rec', 'c_mut', 'c_ran', 'selection', 'duplicates', 'recombination', 'lns', 'window_cache', 'workers']}
+    P = c['P']
+
+    pizza, n_row, n_col, L, H = read_setup(c['input'])
+
+    # The best answer so far is always kept in 'solution.txt', so an interrupted run leaves a valid submission.
+    # Both the answer and the history of the best layouts are written by a background thread.
+    writer = HistoryWriter(res_path + c['history'] if c['history'] else None, res_path + "solution.txt")
+    executor, log, profiler = None, None, None
+    # The history writer, the log, the profiler and the worker processes are closed however the run ends
+    try:
+        executor = make_executor(c['input'], c['workers']) if c['workers'] > 1 else None
+        deadline = t_start + c['time_budget'] if c['time_budget'] is not None else None
+        best_init = [-1]
+        def log_best(A):
+            # Creating the initial population of a big pizza takes long, so its best individual is written right away
+            if A.score() > best_init[0]:
+                best_init[0] = A.score()
+                writer.log(c['i_start'], A)
+
+        if not c['resume']:
+            population = Population(make_random_individuals(pizza, P, executor, c['workers'], deadline, log_best))
+            population.sort()
+        else:
+            print("Continuing previous optimization.")
+            fname = res_path + "generations_backup/G_%s.npz"%i2s(c['i_start'], 4)
+            if not os.path.exists(fname):
+                fname = res_path + "generations_backup/G_%s.json"%i2s(c['i_start'], 4)
+            population = Population(load_population(fname, pizza))
+            print(len(population), P)
+            if len(population) < P:
+                print("Loaded population is smaller than the given max population.\nExtending it with random individuals.")
+                population.extend(make_random_individuals(pizza, P - len(population), executor, c['workers'], deadline, log_best))
+                population.sort()
+            elif len(population) > P:
+                print("Loaded population is bigger than the given max population.\nRemoving the worst individuals.")
+                population.sort()
+                population.truncate(P)
+
+        log = RunLog(res_path + c['run_log']) if c['run_log'] else None
+        profile_range = c['profile_range']
+        profile_fname = res_path + "profile_G%s-%s.prof"%tuple(i2s(G, 4) for G in profile_range) if profile_range else None
+        profiler = Profiler(profile_range, profile_fname)
+        stats.reset()
+
+        writer.log(c['i_start'], population[0])
+        best_score = population[0].score()
+        target_score = n_row * n_col if c['target_score'] is None else c['target_score']
+        n_stall = 0
+
+        scores = []
+        reason = "G_max"
+        G_done = c['i_start'] # last generation that was completed
+        try:
+            for i in range(c['i_start']+1, c['G_max']):
+                if deadline is not None and time.time() > deadline:
+                    reason = "time budget"
+                    break
+                t = time.perf_counter()
+                profiler.start(i)
+                population = make_next_generation(population, pizza, executor, **settings, deadline=deadline)
+                G_done = i
+                eff_max = population[0].efficiency()
+                scores.append((i, eff_max))
+
+                pop_stats = population.stats()
+                if c['verbose']:
+                    print("%s; %7.4f%%; mean %7.4f%%; diversity %4.2f"%(i2s(i, 4), eff_max, 100 * pop_stats['mean'] / n_row / n_col, pop_stats['diversity']))
+                if population[0].score() > best_score:
+                    best_score, n_stall = population[0].score(), 0
+                else:
+                    n_stall += 1
+                with stats.timer('backup'):
+                    writer.log(i, population[0])
+                    if c['checkpoint_every'] and i % c['checkpoint_every'] == 0:
+                        save_population(population, i, pizza, res_path)
+                profiler.stop(i)
+                if log is not None:
+                    log.write(G=i, time=time.perf_counter() - t, best=pop_stats['best'], mean=pop_stats['mean'],
+                              std=pop_stats['std'], diversity=pop_stats['diversity'], size=len(population))
+
+                if best_score >= target_score:
+                    reason = "target score"
+                elif c['stall_generations'] is not None and n_stall >= c['stall_generations']:
+                    reason = "%d generations without improvement"%n_stall
+                elif deadline is not None and time.time() > deadline:
+                    reason = "time budget"
+                else:
+                    continue
+                break
+        except KeyboardInterrupt:
+            reason = "interrupted"
+            writer.log(G_done, population[0])
+
+        if c['verbose']:
+            print("Stopped at generation %s: %s; best %7.4f%%"%(i2s(G_done, 4), reason, population[0].efficiency()))
+        save_population(population, G_done, pizza, res_path)
+
+        with codecs.open(res_path+"opt_convergence.txt", "a") as fout:
+            for i, eff in scores:
+                fout.write("%s; %7.4f\n"%(i2s(i, 4), eff))
+    finally:
+        if profiler is not None:
+            profiler.close()
+        if log is not None:
+            log.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        writer.close()
+
+    return population[0]
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,128 @@
+import gzip
+import json
+import queue
+import threading
+import numpy as np
+
+
+class HistoryWriter:
+    """
+        Writes the history of the best layouts and the current answer in a background thread,
+        so that the generation loop does not wait for the disk.
+
+        The history is a gzip-compressed log of JSON lines, one line per generation whose best layout changed:
+            {"G": generation, "reset": bool, "removed": [[x, y], ...], "added": [[x, y, k], ...]}
+        with the slices removed from and added to the previous logged layout. The first line of every writer
+        has "reset": true and adds the whole layout, so a resumed run appends to the log of the previous one.
+        'read_history' replays it.
+
+            fname, str or None
+        file of the history; None to write only the answers
+            answer_fname, str or None
+        file rewritten with 'save_as_answer' whenever a better layout is logged
+            maxsize, int
+        maximum number of layouts waiting in the queue; 'log' blocks while the queue is full
+    """
+    def __init__(self, fname, answer_fname=None, maxsize=4):
+        self.fname = fname
+        self.answer_fname = answer_fname
+        self.queue = queue.Queue(maxsize)
+        self.last_hash = None
+        self.error = None
+        self.thread = threading.Thread(target=self.__run, daemon=True)
+        self.thread.start()
+
+
+    def log(self, G, A):
+        """
+            Queues the layout of individual A as the best of generation G; nothing is queued if the layout is unchanged.
+            A copy-on-write copy of A is queued, so A may be changed right after the call.
+        """
+        self.__check()
+        if A.layout_hash == self.last_hash:
+            return
+        self.last_hash = A.layout_hash
+        self.queue.put((G, A.copy()))
+
+
+    def close(self):
+        """
+            Waits until all queued layouts are written and closes the files
+        """
+        self.queue.put(None)
+        self.thread.join()
+        self.__check()
+
+
+    ###########################################################################
+
+    def __check(self):
+        if self.error is not None:
+            raise RuntimeError("History writer failed") from self.error
+
+
+    def __run(self):
+        fout = gzip.open(self.fname, 'at') if self.fname else None
+        genes, best_score, reset = np.zeros(0, dtype=np.int64), -1, True
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+                G, A = item
+                if self.answer_fname and A.score() > best_score:
+                    A.save_as_answer(self.answer_fname)
+                    best_score = A.score()
+                if fout is None:
+                    continue
+
+                # Each slice is encoded as one int64 'gene', so the difference is two sorted set operations
+                new = A.to_genes()
+                removed = np.setdiff1d(genes, new, assume_unique=True)
+                added = np.setdiff1d(new, genes, assume_unique=True)
+                genes = new
+
+                pos, k_added = np.divmod(added, len(A.slices))
+                pos_removed = removed // len(A.slices)
+                fout.write(json.dumps({
+                    'G': G, 'reset': reset,
+                    'removed': np.stack([pos_removed % A.n_col, pos_removed // A.n_col], axis=1).tolist(),
+                    'added': np.stack([pos % A.n_col, pos // A.n_col, k_added], axis=1).tolist()}) + "\n")
+                # Sync flush, so that the log written so far stays readable if the process is killed
+                fout.flush()
+                reset = False
+        except Exception as e:
+            self.error = e
+            # Unblock a producer waiting on the full queue
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+        finally:
+            if fout is not None:
+                fout.close()
+
+
+def read_history(fname):
+    """
+        Replays the history written by 'HistoryWriter'.
+        Yields (G, layout) for every logged generation, layout is a dict {(x, y): k}.
+        A log cut off by a killed process is read up to its last complete line.
+    """
+    layout = {}
+    with gzip.open(fname, 'rt') as fin:
+        try:
+            for line in fin:
+                if not line.endswith("\n"):
+                    break
+                record = json.loads(line)
+                if record['reset']:
+                    layout = {}
+                for x, y in record['removed']:
+                    del layout[(x, y)]
+                for x, y, k in record['added']:
+                    layout[(x, y)] = k
+                yield record['G'], dict(layout)
+        except EOFError:
+            return
@@ -1,63 +1,81 @@
+import os
 import random
 import codecs
 import numpy as np
 import matplotlib.pyplot as plt
 import json
-from sublayout import get_sublayout_n
+from collections import deque
+from sublayout import PATTERNS, get_sublayouts_n
+from pizza import read_setup
+from cow import BandedGrid, BandedLayout, BandedIndex
+from instrument import stats, timed
+from solver import solve_region, window_cache, window_key
 random.seed(0)
 
+MASK64 = (1 << 64) - 1
 
-def read_setup(fname):
+
+def zobrist_key(x, y, k, n_col, n_slices):
     """
-        Reads the setup from the input file 'fname'.
-        pizza -- 2D list of pizza contents
-        n_row, n_col -- number of rows and columns in pizza
-        L -- minimum amount of each ingridient in a slice
-        H -- maximum size of a slice
+        Returns the 64-bit random key of slice k placed at (x, y) for the layout hash of 'Individual'.
+        Instead of a table of n_row * n_col * n_slices random numbers, the key is the SplitMix64 mix
+        of the index of (x, y, k); works both for ints and for NumPy arrays of them.
     """
-    with codecs.open(fname, 'r') as fin:
-        n_row, n_col, L, H = list(map(int, fin.readline().split()))
+    if isinstance(x, np.ndarray):
+        z = ((y.astype(np.uint64) * np.uint64(n_col) + x.astype(np.uint64)) * np.uint64(n_slices) + k.astype(np.uint64))
+        z += np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+    z = ((y * n_col + x) * n_slices + k + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
 
-        pizza = []
-        for _ in range(n_row):
-            line = fin.readline().strip()
-            pizza.append(line)
 
-    return pizza, n_row, n_col, L, H
+def _isin_sorted(a, b):
+    """
+        Returns the mask of elements of the sorted array 'a' that are in the sorted array 'b'
+    """
+    if not len(b):
+        return np.zeros(len(a), dtype=bool)
+    idx = np.minimum(np.searchsorted(b, a), len(b) - 1)
+    return b[idx] == a
 
 
-def generate_possible_slices(L, H):
+def _coverage(x, y, wi, he, n_col, n_row):
     """
-        Generates a list of all possible slices based on L and H.
-        Each slice is encoded as (wi, he) - it's width and height, respectively.
+        Returns the (n_row, n_col) array of the number of rectangles (x, y, wi, he) covering each cell,
+        painted through a 2D difference array with four scatters and two cumulative sums
     """
-    n_min = 2 * L
-    n_max = H
+    d = np.zeros((n_row + 1, n_col + 1), dtype=np.int32)
+    np.add.at(d, (y, x), 1)
+    np.add.at(d, (y, x + wi), -1)
+    np.add.at(d, (y + he, x), -1)
+    np.add.at(d, (y + he, x + wi), 1)
+    return d.cumsum(axis=0).cumsum(axis=1)[:n_row, :n_col]
 
-    slices = []
-    for he in range(1, n_max+1):
-        for wi in range(max(1, n_min // he), n_max + 1):
-            if he * wi > n_max:
-                break
-            slices.append((wi, he))
 
-    return slices
+def _window_sums(a, wi, he):
+    """
+        Returns the sums of a over the windows [x, x+wi) x [y, y+he) for every cell (x, y), clipped at the border
+    """
+    sat = np.zeros((a.shape[0] + 1, a.shape[1] + 1), dtype=np.int64)
+    sat[1:, 1:] = a.cumsum(axis=0).cumsum(axis=1)
+    ys, xs = np.arange(a.shape[0]), np.arange(a.shape[1])
+    y1 = np.minimum(ys + he, a.shape[0])[:, None]
+    x1 = np.minimum(xs + wi, a.shape[1])[None, :]
+    return sat[y1, x1] - sat[ys[:, None], x1] - sat[y1, xs[None, :]] + sat[ys[:, None], xs[None, :]]
 
 
 def draw_pizza(pizza):
     """
         Draws the image of pizza into the "img_pizza.pdf" as 2D colormap
     """
-    n_row = len(pizza)
-    n_col = len(pizza[0])
-
-    mtr = np.zeros((n_row, n_col), dtype=int)
-    for i in range(n_row):
-        row = pizza[i]
-        _row = row.replace('T', '1')
-        _row = _row.replace('M', '0')
-        _row = list(map(int, list(_row)))
-        mtr[i] = np.array(_row)
+    n_row = pizza.n_row
+    n_col = pizza.n_col
+    mtr = pizza.grid
 
     scale = 10.0 / max(n_row, n_col)
 
@@ -75,18 +93,26 @@ class Individual:
     """
         Representation of a solution to the problem (indivudual)
 
-            layout, dict of (int, int): int
+            layout, BandedLayout of (int, int): int
         gene of an individual encoded as (x, y): k
         (x, y) is the position on the pizza, ([0:n_col], [n_row])
         k is the index of slice that has its upper left cell at this pos
 
-            c_empty, set((int, int)) 
-        set of all (x,y) cells that are empty
+            grid, BandedGrid of (n_row, n_col) cells
+        occupancy grid, stores information about which slice occupies a cell;
+        if a cell is empty, it is -1
+        otherwise, it is the id x + y * n_col of the slice (x,y) from layout that occupies this cell
+
+            n_empty, int
+        number of empty cells in the grid
+
+            layout_hash, int
+        Zobrist hash of the layout: XOR of 'zobrist_key' of all slices, updated with every placed or removed slice;
+        equal layouts have equal hashes
 
-            s_pos_map, dict of (int, int)
-        dict of all used cells, stores information about which slice occupies a cell;
-        if a cell is empty, it is not in this dict
-        otherwise, it is the (x,y) from layout that occupies this cell
+            empty_index, BandedIndex or None
+        index of all empty cells for sampling of mutation sites in O(log(n_row / BAND_ROWS));
+        built on the first mutation or copy, and then updated with every placed or removed slice
 
             n_col, n_row, int
         number of columns and rows in pizza
@@ -99,79 +125,107 @@ class Individual:
         
             slices, list[(int, int)]
         list of all possible slices with these L and H
-    """
-    layout = {}
-    empty = set()
-    slice_map = {}
-    n_col, n_row = 0, 0
-    L, H = 0, 0
-    slices = []
 
+        All the state above is stored per instance; the only object shared between individuals
+        is the read-only 'slices' list.
+        'layout' and 'grid' are copy-on-write: a copy shares them with the original individual,
+        and only the bands of rows changed afterwards are duplicated.
+    """
     def __init__(self, lay, slices, n_col, n_row, L, H):
-        self.empty = set([(x, y) for x in range(n_col) for y in range(n_row)])
-        self.layout = dict(lay)
+        self.layout = BandedLayout(n_row)
         self.n_col = n_col
         self.n_row = n_row
         self.L = L
         self.H = H
         self.slices = slices
+        self.grid = BandedGrid(n_row, n_col)
+        self.n_empty = n_row * n_col
+        self.layout_hash = 0
+        self.empty_index = None
 
-        for (x, y) in self.layout:
-            k = self.layout[(x, y)]
-            wi, he = self.slices[k]
-            for j in range(y, y+he):
-                for i in range(x, x+wi):
-                    self.slice_map[(i, j)] = (x, y)
-                    self.empty.discard((i, j))
+        for (x, y), k in lay.items():
+            self.__place(x, y, k)
 
 
-    def fill_layout(self, pizza, direction='random'):
+    @timed('fill_layout')
+    def fill_layout(self, pizza, direction='random', region=None, cells=None, cache=False):
         """
             Procedure fills the Individual layout, which might empty or filled to some extent.
             Input layout is assumed to be correct, such that none of slices do exceed the boundary, 
             overlap with other slices, or do not satisfy the contents condition.
+
+            region, (int, int, int, int)
+                if given, only cells (x, y) with x0 <= x < x1 and y0 <= y < y1 of region (x0, y0, x1, y1)
+                are tried as the upper left cells of new slices; otherwise, the whole pizza is walked
+
+            cells, (array, array)
+                if given, only the cells with coordinates (xs, ys) are tried, in the order of the direction
+
+            cache, bool
+                if True and the region is given, the window of the region gets at least as many used cells
+                as its best known packing in 'solver.window_cache': an optimal packing is taken instead of filling,
+                a greedy one replaces the new packing if that uses fewer cells; a better new packing is stored
         """
         if direction == 'random':
             direction = random.choice(['lrud', 'udlr', 'rldu', 'durl'])
 
-        for (x, y) in self.__generate_walk(direction):
-            if not (x,y) in self.empty or self.__isolated_cell(x, y):
+        key = None
+        if cache and region is not None:
+            # Slices starting in the region lie within the window that extends it by H-1 cells to the right and down
+            x0, y0, x1, y1 = region
+            window = (x0, y0, min(x1 + self.H - 1, self.n_col), min(y1 + self.H - 1, self.n_row))
+            key = window_key(pizza, window, self.grid.window(x0, y0, window[2] - x0, window[3] - y0) != -1)
+            entry = window_cache.get(key)
+            if entry is not None and entry[2]:
+                for i, j, k in entry[1]:
+                    self.__place(x0 + i, y0 + j, k)
+                return
+            packing, used = [], 0
+
+        visited, tried, placed = 0, 0, 0
+        for (x, y) in self.__generate_walk(direction, region, cells):
+            visited += 1
+            if self.grid[y, x] != -1 or self.__isolated_cell(x, y):
                 continue
 
-            # Trying to place each type of slice in a random order
-            i_slice = [i for i in range(len(self.slices))]
+            # Trying to place each type of slice that fits the pizza here in a random order
+            i_slice = pizza.legal_slices(x, y)
             random.shuffle(i_slice)
             for k in i_slice:
+                tried += 1
                 wi, he = self.slices[k]
-                if self.__exceeds_boundary(x, y, wi, he) or \
-                    self.__collides_w_used(x, y, wi, he) or \
-                    not self.__enough_contents(pizza, x, y, wi, he):
+                if self.__collides_w_used(x, y, wi, he):
                     # Impossible to place slice k here
                     continue
                 else:
-                    # Placing the slice
-                    self.layout[(x,y)] = k
-                    for j in range(y, y + he):
-                        for i in range(x, x + wi):
-                            self.slice_map[(i, j)] = (x, y)
-                            self.empty.remove((i, j))
-                            # self.empty.discard(c)
+                    self.__place(x, y, k)
+                    placed += 1
+                    if key is not None:
+                        packing.append((x - x0, y - y0, k))
+                        used += wi * he
                     break
 
+        stats.add('cells_visited', visited)
+        stats.add('slices_tried', tried)
+        stats.add('slices_placed', placed)
+        if key is None:
+            return
+        if entry is not None and entry[0] > used:
+            for i, j, _ in packing:
+                self.__remove(x0 + i, y0 + j)
+            for i, j, k in entry[1]:
+                self.__place(x0 + i, y0 + j, k)
+        else:
+            window_cache.put(key, used, packing)
+
 
     def draw_layout(self, fname="img_layout.pdf"):
         """
             Draws the image of the layout into the 'fname' as 2D colormap
             Input layout is assumed to be correct (slices are within the pizza boundaries)
         """
-        mtr = np.zeros((self.n_row, self.n_col), dtype=int)
+        mtr = (self.grid.to_array() != -1).astype(int)
 
-        for (x, y), k in self.layout.items():
-            wi, he = self.slices[k]
-            for i in range(y, y + he):
-                for j in range(x, x + wi):
-                    mtr[i][j] = 1
-        
         scale = 10.0 / max(self.n_row, self.n_col)
 
         plt.figure(figsize=(self.n_row * scale, self.n_col * scale))
@@ -184,34 +238,60 @@ class Individual:
         plt.close()
 
 
-    def mutate(self, pizza, levels=1):
+    @timed('mutate')
+    def mutate(self, pizza, levels=1, max_slices=None, lns=0.0, cache=False):
         """
             Mutate individual:
             1. Pick a random empty cell (sx, sy)
             2. Select the cluster of empty cells around (sx, sy)
             3. Remove all slices that are adjacent to the cluster
-            4. Fill the layout again
+            4. Fill the layout again, only around the freed cells
+
+            max_slices, int
+                if given, at most this many slices closest to (sx, sy) are removed at each level
+
+            lns, float
+                probability that, instead of steps 2-4, the H x H window around (sx, sy) is packed optimally
+                with 'solver.solve_region' (a large neighbourhood search move)
+
+            cache, bool
+                if True, the freed region is filled with its best known packing, see 'fill_layout'
         """
-        if not self.empty:
+        if not self.n_empty:
             return
 
-        sx, sy = random.choice(tuple(self.empty))
+        if self.empty_index is None:
+            self.__build_empty_index()
+        sx, sy = self.empty_index.sample(random)
 
+        if lns and random.random() < lns:
+            # Larger windows are mostly abandoned by the exact search on d_big
+            wi, he = min(self.H, self.n_col), min(self.H, self.n_row)
+            x0 = min(max(sx - wi // 2, 0), self.n_col - wi)
+            y0 = min(max(sy - he // 2, 0), self.n_row - he)
+            solve_region(self, pizza, (x0, y0, x0 + wi, y0 + he))
+            return
+
+        x0, y0, x1, y1 = sx, sy, sx + 1, sy + 1
         for _ in range(levels):
-            _, to_remove = self.__get_adjacent(sx, sy, visited=set(), to_remove=set())
+            visited, to_remove = self.__get_adjacent(sx, sy, max_slices)
+            x0 = min(x0, min(x for x, _ in visited))
+            y0 = min(y0, min(y for _, y in visited))
+            x1 = max(x1, max(x for x, _ in visited) + 1)
+            y1 = max(y1, max(y for _, y in visited) + 1)
 
             for (x, y) in to_remove:
-                k = self.layout.pop((x, y))
+                wi, he = self.slices[self.layout[(x, y)]]
+                x0, y0 = min(x0, x), min(y0, y)
+                x1, y1 = max(x1, x + wi), max(y1, y + he)
+                self.__remove(x, y)
 
-                wi, he = self.slices[k]
-                for j in range(y, y + he):
-                    for i in range(x, x + wi):
-                        self.slice_map.pop((i, j))
-                        self.empty.add((i, j))
-
-        self.fill_layout(pizza, 'random')
+        # New slices can start up to H-1 cells to the left or up from the freed cells
+        region = (max(x0 - self.H + 1, 0), max(y0 - self.H + 1, 0), x1, y1)
+        self.fill_layout(pizza, 'random', region, cache=cache)
 
 
+    @timed('recombine')
     def recombine(self, other, pizza):
         """
             Creates two new indivuduals based on parents 'self' and 'other'
@@ -242,42 +322,187 @@ class Individual:
         s_x = random.randint(1, self.n_col-1)
         s_y = random.randint(1, self.n_row-1)
 
-        pattern = random.choice(['left', 'upper', 'upper-left', 'upper-right', 'bottom-left', 'bottom-right', 'cross'])
-        A_1, A_2 = {}, {}
-        for (x, y), k in self.layout.items():
-            wi, he = self.slices[k]
-            n = get_sublayout_n(pattern, x, y, wi, he, s_x, s_y)
-            if n == 1:
-                A_1[(x,y)] = k
-            elif n == 2:
-                A_2[(x,y)] = k
-
-        B_1, B_2 = {}, {}
-        for (x,y), k in other.layout.items():
-            wi, he = self.slices[k]
-            n = get_sublayout_n(pattern, x, y, wi, he, s_x, s_y)
-            if n == 1:
-                B_1[(x,y)] = k
-            elif n == 2:
-                B_2[(x,y)] = k
+        pattern = random.choice(PATTERNS)
+        # Sub-layouts are selected by masks over the array-encoded layouts, see 'get_sublayouts_n'
+        shapes = np.array(self.slices, dtype=np.int32).reshape(-1, 2)
+        A, B = self.to_arrays(), other.to_arrays()
+        n_A = get_sublayouts_n(pattern, A[0], A[1], shapes[A[2], 0], shapes[A[2], 1], s_x, s_y)
+        n_B = get_sublayouts_n(pattern, B[0], B[1], shapes[B[2], 0], shapes[B[2], 1], s_x, s_y)
 
-        C = Individual({**A_1, **B_2}, self.slices, self.n_col, self.n_row, self.L, self.H)
+        C_arrays = [np.concatenate([a[n_A == 1], b[n_B == 2]]) for a, b in zip(A, B)]
+        C = Individual.from_arrays(*C_arrays, self.slices, self.n_col, self.n_row, self.L, self.H)
         C.fill_layout(pizza, 'random')
-        D = Individual({**A_2, **B_1}, self.slices, self.n_col, self.n_row, self.L, self.H)
+        D_arrays = [np.concatenate([a[n_A == 2], b[n_B == 1]]) for a, b in zip(A, B)]
+        D = Individual.from_arrays(*D_arrays, self.slices, self.n_col, self.n_row, self.L, self.H)
         D.fill_layout(pizza, 'random')
         return C, D
 
 
+    @timed('recombine')
+    def recombine_block(self, other, pizza):
+        """
+            Creates two new individuals by swapping a random rectangular block between parents 'self' and 'other'
+            (recombination 2):
+                C = slices of 'self' outside the block + slices of 'other' inside the block
+                D = slices of 'other' outside the block + slices of 'self' inside the block
+            Slices that cross the border of the block are dropped. Only the seam around the border is filled again:
+            the rest of each child is copied from a parent, where nothing more could be placed.
+        """
+        bx0, bx1 = sorted(random.sample(range(self.n_col + 1), 2))
+        by0, by1 = sorted(random.sample(range(self.n_row + 1), 2))
+
+        shapes = np.array(self.slices, dtype=np.int32).reshape(-1, 2)
+        parents = []
+        for x, y, k in [self.to_arrays(), other.to_arrays()]:
+            wi, he = shapes[k, 0], shapes[k, 1]
+            inside = (x >= bx0) & (x + wi <= bx1) & (y >= by0) & (y + he <= by1)
+            outside = (x + wi <= bx0) | (x >= bx1) | (y + he <= by0) | (y >= by1)
+            parents.append(((x, y, k), inside, outside))
+
+        children = []
+        for (P, _, P_out), (Q, Q_in, _) in [parents, parents[::-1]]:
+            arrays = [np.concatenate([p[P_out], q[Q_in]]) for p, q in zip(P, Q)]
+            child = Individual.from_arrays(*arrays, self.slices, self.n_col, self.n_row, self.L, self.H)
+            for region in self.__seam_regions(bx0, by0, bx1, by1):
+                child.fill_layout(pizza, 'random', region)
+            children.append(child)
+        return children[0], children[1]
+
+
+    @timed('recombine')
+    def recombine_common(self, other, pizza, p_common=0.1, p_other=0.5):
+        """
+            Creates two new individuals from the genes common to parents 'self' and 'other' (recombination 3).
+            A gene is a slice k at (x, y), see 'to_genes'. Each child starts from one parent and:
+            1. keeps the common genes, except the fraction 'p_common' of them, and the fraction 1 - 'p_other'
+               of the other genes of its parent;
+            2. takes all genes of the other parent that fit into the freed cells;
+            3. is filled again, walking only the cells from which a new slice may cover a freed cell.
+            The intersection and the removals are vectorised operations over the sorted gene arrays.
+        """
+        rng = np.random.default_rng(random.getrandbits(64))
+        n_k = len(self.slices)
+        shapes = np.array(self.slices, dtype=np.int32).reshape(-1, 2)
+        A, B = self.to_genes(), other.to_genes()
+        in_B, in_A = _isin_sorted(A, B), _isin_sorted(B, A)
+        common = A[in_B]
+
+        children = []
+        for parent, own_only, donor_only in [(self, A[~in_B], B[~in_A]), (other, B[~in_A], A[~in_B])]:
+            kept = np.concatenate([common[rng.random(len(common)) >= p_common],
+                                   own_only[rng.random(len(own_only)) >= p_other]])
+            pos, k = np.divmod(kept, n_k)
+            x, y = pos % self.n_col, pos // self.n_col
+            used = _coverage(x, y, shapes[k, 0], shapes[k, 1], self.n_col, self.n_row)
+
+            # Genes of the donor do not overlap each other, so all of them that lie on free cells are taken at once
+            pos_d, k_d = np.divmod(donor_only, n_k)
+            x_d, y_d = pos_d % self.n_col, pos_d // self.n_col
+            wi_d, he_d = shapes[k_d, 0], shapes[k_d, 1]
+            sat = np.zeros((self.n_row + 1, self.n_col + 1), dtype=np.int64)
+            sat[1:, 1:] = used.cumsum(axis=0).cumsum(axis=1)
+            fits = (sat[y_d + he_d, x_d + wi_d] - sat[y_d, x_d + wi_d] - sat[y_d + he_d, x_d] + sat[y_d, x_d]) == 0
+            x, y, k = np.concatenate([x, x_d[fits]]), np.concatenate([y, y_d[fits]]), np.concatenate([k, k_d[fits]])
+
+            child = Individual.from_arrays(x, y, k, self.slices, self.n_col, self.n_row, self.L, self.H)
+            empty = child.grid.to_array() == -1
+            freed = (parent.grid.to_array() != -1) & empty
+            # New slices can start up to H-1 cells to the left or up from the freed cells
+            ys, xs = np.nonzero((_window_sums(freed, self.H, self.H) > 0) & empty)
+            # Cells where no legal slice fits now would not get one later, as filling only takes cells
+            sat[1:, 1:] = (~empty).cumsum(axis=0).cumsum(axis=1)
+            fits = np.zeros(len(xs), dtype=bool)
+            for s, (wi, he) in enumerate(self.slices):
+                x1, y1 = np.minimum(xs + wi, self.n_col), np.minimum(ys + he, self.n_row)
+                fits |= pizza.feasible[ys, xs, s] & (sat[y1, x1] - sat[ys, x1] - sat[y1, xs] + sat[ys, xs] == 0)
+            xs, ys = xs[fits], ys[fits]
+            child.fill_layout(pizza, 'random', cells=(xs, ys))
+            children.append(child)
+        return children[0], children[1]
+
+
     def efficiency(self):
-        return 100 * (1 - len(self.empty) / self.n_row / self.n_col)
+        return 100 * (1 - self.n_empty / self.n_row / self.n_col)
 
 
     def score(self):
-        return self.n_col * self.n_row - len(self.empty)
+        return self.n_col * self.n_row - self.n_empty
 
 
+    @timed('copy')
     def copy(self):
-        return Individual(self.layout, self.slices, self.n_col, self.n_row, self.L, self.H)
+        other = Individual.__new__(Individual)
+        other.__dict__.update(self.__dict__)
+        other.layout = self.layout.copy()
+        other.grid = self.grid.copy()
+        # The index is built once in the parent and shared with all its copies
+        if self.empty_index is None:
+            self.__build_empty_index()
+        other.empty_index = self.empty_index.copy()
+        return other
+
+
+    def to_arrays(self):
+        """
+            Returns the layout encoded as three int32 arrays (x, y, k), one element per slice
+        """
+        return self.layout.to_arrays()
+
+
+    def to_genes(self):
+        """
+            Returns the layout encoded as the sorted int64 array of genes (y * n_col + x) * n_slices + k, one per slice
+        """
+        x, y, k = self.to_arrays()
+        return np.sort((y.astype(np.int64) * self.n_col + x) * len(self.slices) + k)
+
+
+    @classmethod
+    def from_arrays(cls, x, y, k, slices, n_col, n_row, L, H):
+        """
+            Creates an individual from the layout encoded as arrays (x, y, k), see 'to_arrays'.
+            The occupancy grid is painted with one vectorised assignment per cell of each slice shape,
+            instead of the per-slice replay of __init__.
+        """
+        x, y, k = np.asarray(x, dtype=np.int32), np.asarray(y, dtype=np.int32), np.asarray(k, dtype=np.int32)
+        if len(k) < 64:
+            # The NumPy overhead does not pay off for a few slices
+            return cls(dict(zip(zip(x.tolist(), y.tolist()), k.tolist())), slices, n_col, n_row, L, H)
+
+        grid = np.full((n_row, n_col), -1, dtype=np.int32)
+        owner = (x + y * n_col).astype(np.int32)
+        for s in np.unique(k).tolist():
+            wi, he = slices[s]
+            sel = k == s
+            xs, ys, ids = x[sel], y[sel], owner[sel]
+            for dy in range(he):
+                for dx in range(wi):
+                    grid[ys + dy, xs + dx] = ids
+
+        A = cls({}, slices, n_col, n_row, L, H)
+        A.grid = BandedGrid.from_array(grid)
+        A.layout = BandedLayout.from_arrays(n_row, x, y, k)
+        A.n_empty = int((grid == -1).sum())
+        A.layout_hash = int(np.bitwise_xor.reduce(zobrist_key(x, y, k, n_col, len(slices)), initial=np.uint64(0)))
+        return A
+
+
+    def diff(self, other):
+        """
+            Returns the changes (removed, added) that turn the layout of 'other' into the layout of this individual.
+            'self' is assumed to be a modified copy of 'other', see 'BandedLayout.diff'
+        """
+        return self.layout.diff(other.layout)
+
+
+    def apply_diff(self, removed, added):
+        """
+            Applies the changes returned by 'diff' to this individual
+        """
+        for (x, y) in removed:
+            self.__remove(x, y)
+        for (x, y), k in added:
+            self.__place(x, y, k)
 
 
     def dump_layout(self, fname):
@@ -286,62 +511,97 @@ class Individual:
                 fout.write("%4d, %4d, %2d\n"%(x, y, k))
 
     
-    def load_layout(self, fname):
+    def load_layout(self, fname, pizza):
         with codecs.open(fname, 'r') as fin:
             for line in fin:
                 x, y, k = map(int, line.split(','))
                 wi, he = self.slices[k]
                 if self.__exceeds_boundary(x, y, wi, he) or \
                     self.__collides_w_used(x, y, wi, he) or \
-                    not self.__enough_contents(pizza, x, y, wi, he):
+                    not pizza.enough_contents(x, y, wi, he):
                     print("Error in the in the given layout")
                     return
                 else:
-                    self.layout[(x,y)] = k
-                    for j in range(y, y + he):
-                        for i in range(x, x + wi):
-                            self.slice_map[(i, j)] = (x, y)
-                            self.empty.remove((i, j))
+                    self.__place(x, y, k)
 
 
     def check_correctness(self, pizza):
         """
             Checks the correctness of current layout
         """
-        self.empty = set([i for i in range(self.n_row * self.n_col)])
+        used = np.zeros((self.n_row, self.n_col), dtype=bool)
         for (x,y), k in self.layout.items():
             wi, he = self.slices[k]
 
             if self.__exceeds_boundary(x, y, wi, he) or \
-                self.__collides_w_used(x, y, wi, he) or \
-                not self.__enough_contents(pizza, x, y, wi, he):
+                not pizza.enough_contents(x, y, wi, he) or \
+                used[y:y + he, x:x + wi].any():
                 return False
             else:
-                for j in range(y, y + he):
-                    for i in range(x, x + wi):
-                        if not (i,j) in self.empty:
-                            return False
-                        self.empty.remove((x,y))
+                used[y:y + he, x:x + wi] = True
         return True
 
 
     def save_as_answer(self, fname):
-        with codecs.open(fname, 'w') as fout:
+        """
+            Writes the layout in the submission format. The file is written under a temporary name and then renamed,
+            so 'fname' always holds a complete answer, even if the process is killed while writing.
+        """
+        tmp_fname = fname + ".tmp"
+        with codecs.open(tmp_fname, 'w') as fout:
             fout.write("%d\n"%len(self.layout))
             for (x, y), k in self.layout.items():
                 wi, he = self.slices[k]
                 fout.write("%d %d %d %d\n"%(y, x, y+he-1, x+wi-1))
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(tmp_fname, fname)
 
 
     ###########################################################################
 
+    def __place(self, x, y, k):
+        """
+            Puts the slice k with its upper left cell at (x, y) into the layout and the occupancy grid
+        """
+        wi, he = self.slices[k]
+        self.layout[(x, y)] = k
+        self.grid.fill(x, y, wi, he, x + y * self.n_col)
+        self.n_empty -= wi * he
+        self.layout_hash ^= zobrist_key(x, y, k, self.n_col, len(self.slices))
+        if self.empty_index is not None:
+            self.empty_index.remove_rect(x, y, wi, he)
+
+
+    def __remove(self, x, y):
+        """
+            Removes the slice with its upper left cell at (x, y) from the layout and the occupancy grid
+        """
+        k = self.layout.pop((x, y))
+        wi, he = self.slices[k]
+        self.grid.fill(x, y, wi, he, -1)
+        stats.add('slices_removed')
+        self.n_empty += wi * he
+        self.layout_hash ^= zobrist_key(x, y, k, self.n_col, len(self.slices))
+        if self.empty_index is not None:
+            self.empty_index.add_rect(x, y, wi, he)
+
+
+    def __build_empty_index(self):
+        """
+            Builds the index of empty cells from the occupancy grid
+        """
+        ys, xs = self.grid.find(-1)
+        self.empty_index = BandedIndex(self.n_row, self.n_col, xs, ys)
+
+
     def __isolated_cell(self, x, y):
         """
             Checks if there is a border or a filled cell to the left of (x,y) AND down the (x,y).
             If so, then the cell is isolated and nothing would fit there.
         """
-        if ((x+1 >= self.n_col) or not (x+1, y) in self.empty) and \
-            ((y+1 >= self.n_row) or not (x, y+1) in self.empty):
+        if ((x+1 >= self.n_col) or self.grid[y, x+1] != -1) and \
+            ((y+1 >= self.n_row) or self.grid[y+1, x] != -1):
             return True
         return False
 
@@ -357,82 +617,97 @@ class Individual:
         """
             Checks, if the slice (wi, he) placed at (x, y) would overlap with one of the non-empty pizza cells
         """
-        for j in range(y, y + he):
-            for i in range(x, x + wi):
-                if not (i, j) in self.empty:
-                    return True
-        return False
-
-
-    def __enough_contents(self, pizza, x, y, wi, he):
-        """
-            Checks, if the slice (wi, he) placed at (x, y) would have enough of M and T contents
-        """
-        T = 0
-        M = 0
-        for i in range(y, y + he):
-            for j in range(x, x + wi):
-                v = pizza[i][j]
-                if v == 'T':
-                    T += 1
-                else:
-                    M += 1
-        return (T >= self.L) and (M >= self.L)
+        g = self.grid
+        # Corners are checked first, as most collisions happen there
+        if g[y, x + wi - 1] != -1 or g[y + he - 1, x] != -1 or g[y + he - 1, x + wi - 1] != -1:
+            return True
+        return g.region_max(x, y, wi, he) != -1
 
 
-    def __generate_walk(self, direction='lrud'):
+    def __generate_walk(self, direction='lrud', region=None, cells=None):
         """
             Returns the generator of (x,y) pairs in the direction defined by 'key' parameter
+            within the region (x0, y0, x1, y1), or the whole pizza if region is None,
+            or over the given cells (xs, ys) only
         """
+        if cells is not None:
+            xs, ys = cells
+            order = np.lexsort((xs, ys) if direction in ('lrud', 'rldu') else (ys, xs))
+            if direction in ('rldu', 'durl'):
+                order = order[::-1]
+            yield from zip(xs[order].tolist(), ys[order].tolist())
+            return
+
+        x0, y0, x1, y1 = region if region is not None else (0, 0, self.n_col, self.n_row)
         if direction == 'lrud':
-            for y in range(self.n_row):
-                for x in range(self.n_col):
+            for y in range(y0, y1):
+                for x in range(x0, x1):
                     yield (x, y)
         elif direction == 'udlr':
-            for x in range(self.n_col):
-                for y in range(self.n_row):
+            for x in range(x0, x1):
+                for y in range(y0, y1):
                     yield (x, y)
         elif direction == 'rldu':
-            for y in range(self.n_row-1, -1, -1):
-                for x in range(self.n_col-1, -1, -1):
+            for y in range(y1-1, y0-1, -1):
+                for x in range(x1-1, x0-1, -1):
                     yield (x, y)
         elif direction == 'durl':
-            for x in range(self.n_col-1, -1, -1):
-                for y in range(self.n_row-1, -1, -1):
+            for x in range(x1-1, x0-1, -1):
+                for y in range(y1-1, y0-1, -1):
                     yield (x, y)
 
 
-    def __get_adjacent(self, x, y, visited, to_remove):
+    def __seam_regions(self, bx0, by0, bx1, by1):
         """
-            Finds all slices that are adjacent to the block of empty cells with the beginning at 'pos'
-            
-            visited, set(int)
-                set of cells that have already been visited by the procedure
+            Returns the regions (x0, y0, x1, y1) of upper left cells of all slices that may overlap the seam
+            of the block [bx0, bx1) x [by0, by1): the cells closer than H to its border.
+            Regions are the four sides of the border, clipped to the pizza; empty sides are skipped.
+        """
+        H = self.H
+        sides = [
+            (bx0 - 2*H + 2, by0 - 2*H + 2, bx1 + H - 1, by0 + H - 1), # upper
+            (bx0 - 2*H + 2, by1 - 2*H + 2, bx1 + H - 1, by1 + H - 1), # bottom
+            (bx0 - 2*H + 2, by0 + H - 1, bx0 + H - 1, by1 - 2*H + 2), # left
+            (bx1 - 2*H + 2, by0 + H - 1, bx1 + H - 1, by1 - 2*H + 2), # right
+        ]
+        regions = []
+        for x0, y0, x1, y1 in sides:
+            x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, self.n_col), min(y1, self.n_row)
+            if x0 < x1 and y0 < y1:
+                regions.append((x0, y0, x1, y1))
+        return regions
+
+
+    def __get_adjacent(self, x, y, max_slices=None):
+        """
+            Finds all slices that are adjacent to the block of empty cells with the beginning at (x, y).
+            The block is walked with an iterative breadth-first flood fill, so the slices closest
+            to (x, y) are found first; the walk stops once 'max_slices' slices are found.
+
+            visited, set((int, int))
+                set of cells that have been visited by the procedure
             
-            to_remove, set(int)
+            to_remove, set((int, int))
                 set of adjacent slices positions, that will be removed during the mutation
         """
-        visited.add((x,y))
-
-        if not (x,y) in self.empty:
-            to_remove.add(self.slice_map[(x,y)])
-            return visited, to_remove
+        visited = {(x, y)}
+        to_remove = set()
+        queue = deque([(x, y)])
+        while queue:
+            x, y = queue.popleft()
+
+            owner = int(self.grid[y, x])
+            if owner != -1:
+                to_remove.add((owner % self.n_col, owner // self.n_col))
+                if max_slices is not None and len(to_remove) >= max_slices:
+                    break
+                continue
 
-        else:
-            possible_moves = []
-            if x+1 < self.n_col:
-                possible_moves.append((x+1,y))
-            if x-1 >= 0:
-                possible_moves.append((x-1,y))
-            if y+1 < self.n_row:
-                possible_moves.append((x,y+1))
-            if y-1 >= 0:
-                possible_moves.append((x,y-1))
-
-            for (x,y) in possible_moves:
-                if not (x, y) in visited:
-                    visited, to_remove = self.__get_adjacent(x, y, visited, to_remove)
-            return visited, to_remove
+            for (i, j) in ((x+1, y), (x-1, y), (x, y+1), (x, y-1)):
+                if 0 <= i < self.n_col and 0 <= j < self.n_row and not (i, j) in visited:
+                    visited.add((i, j))
+                    queue.append((i, j))
+        return visited, to_remove
 
 
     def __str__(self):
@@ -454,10 +729,18 @@ class Individual:
         return self.score() >= other.score()
 
 
+# Recombination operators by the name of the 'recombination' setting of a run
+RECOMBINATIONS = {
+    'quadrant': Individual.recombine,
+    'block': Individual.recombine_block,
+    'common': Individual.recombine_common,
+}
+
+
 
 if __name__ == "__main__":
     pizza, n_row, n_col, L, H = read_setup("input/d_big.in") # a_example  b_small  c_medium  d_big
-    slices = generate_possible_slices(L, H)
+    slices = pizza.slices
     # print("Max score is %d"%(n_col * n_row))
     # for i in range(len(slices)):
     #     print(i, slices[i])
@@ -0,0 +1,151 @@
+import csv
+import json
+import time
+import cProfile
+import functools
+from contextlib import contextmanager
+
+
+# Phases of a generation, timed by 'make_next_generation' and the main loop of 'genetic.py'
+PHASES = ['selection', 'recombination', 'mutation', 'random', 'offspring', 'duplicates', 'sort', 'backup']
+
+# Operations of 'Individual', timed inclusively (time of 'mutate' includes its 'fill_layout')
+OPERATIONS = ['fill_layout', 'mutate', 'recombine', 'copy', 'solve_region']
+
+# Counters of 'Individual' operations, of 'solver.solve_region' and of 'solver.window_cache'
+COUNTERS = ['cells_visited', 'slices_tried', 'slices_placed', 'slices_removed', 'solve_gain', 'solve_aborted',
+            'cache_hits', 'cache_misses', 'cache_evictions']
+
+
+class Stats:
+    """
+        Timers and counters of the current generation, see 'PHASES', 'OPERATIONS' and 'COUNTERS'.
+        The module instance 'stats' is shared by all code of the process; 'snapshot' returns the values and resets them.
+    """
+    def __init__(self):
+        self.reset()
+
+
+    def reset(self):
+        self.times = dict.fromkeys(PHASES + OPERATIONS, 0.0)
+        self.counts = dict.fromkeys(OPERATIONS + COUNTERS, 0)
+
+
+    def add(self, name, n=1):
+        self.counts[name] += n
+
+
+    @contextmanager
+    def timer(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += time.perf_counter() - t
+
+
+    def merge(self, snapshot):
+        """
+            Adds the values of a snapshot, e.g. taken in a worker process
+        """
+        for name, value in snapshot['times'].items():
+            self.times[name] += value
+        for name, value in snapshot['counts'].items():
+            self.counts[name] += value
+
+
+    def snapshot(self):
+        res = {'times': self.times, 'counts': self.counts}
+        self.reset()
+        return res
+
+
+stats = Stats()
+
+
+def timed(name):
+    """
+        Decorator that adds the time and the number of calls of a method to 'stats' under 'name'
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.times[name] += time.perf_counter() - t
+                stats.add(name)
+        return wrapper
+    return decorator
+
+
+class RunLog:
+    """
+        Log of a run with one record per generation: the given values, and the timers and counters of 'stats'.
+        The format is chosen by the extension of 'fname': '.csv', or JSON lines otherwise.
+        Timers are written as 'time_<name>' in seconds, counters as 'n_<name>'.
+    """
+    def __init__(self, fname):
+        self.fname = fname
+        self.csv = fname.endswith('.csv')
+        self.fout = open(fname, 'a', newline='')
+        self.writer = None
+
+
+    def write(self, **values):
+        snapshot = stats.snapshot()
+        record = dict(values)
+        record.update(('time_' + name, value) for name, value in snapshot['times'].items())
+        record.update(('n_' + name, value) for name, value in snapshot['counts'].items())
+
+        if self.csv:
+            if self.writer is None:
+                self.writer = csv.DictWriter(self.fout, fieldnames=list(record))
+                if self.fout.tell() == 0:
+                    self.writer.writeheader()
+            self.writer.writerow(record)
+        else:
+            self.fout.write(json.dumps(record) + "\n")
+        self.fout.flush()
+
+
+    def close(self):
+        self.fout.close()
+
+
+class Profiler:
+    """
+        Profiles the generations G_first <= G <= G_last with cProfile and dumps the profile into 'fname'
+        (readable with 'python -m pstats' or snakeviz). Call 'start(G)' before and 'stop(G)' after every generation.
+        With 'profile_range' None nothing is profiled.
+    """
+    def __init__(self, profile_range, fname):
+        self.range = profile_range
+        self.fname = fname
+        self.profile = None
+
+
+    def start(self, G):
+        if self.range is not None and self.range[0] <= G <= self.range[1]:
+            if self.profile is None:
+                self.profile = cProfile.Profile()
+            self.profile.enable()
+
+
+    def stop(self, G):
+        if self.profile is None:
+            return
+        self.profile.disable()
+        if G >= self.range[1]:
+            self.close()
+
+
+    def close(self):
+        """
+            Dumps the profile if the run stopped before G_last
+        """
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.fname)
+            self.profile = None
@@ -0,0 +1,179 @@
+import queue
+import random
+import traceback
+import multiprocessing as mp
+import numpy as np
+from individual import Individual
+from pizza import read_setup
+from genetic import make_next_generation, index_dtype, DEFAULTS
+from population import Population
+from solver import window_cache
+
+
+def layout_dtypes(n_col, n_row, n_slices):
+    """
+        Returns the little-endian dtypes of x, y and k in 'encode_layout', the smallest that fit the pizza
+    """
+    return [np.dtype(index_dtype(n)).newbyteorder('<') for n in (n_col, n_row, n_slices)]
+
+
+def encode_layout(A):
+    """
+        Encodes the layout of individual A as bytes: little-endian arrays x, y and k,
+        each stored as the smallest unsigned ints that hold its values, see 'layout_dtypes'
+    """
+    return b''.join(a.astype(dtype).tobytes() for a, dtype in zip(A.to_arrays(), layout_dtypes(A.n_col, A.n_row, len(A.slices))))
+
+
+def decode_layout(data, pizza):
+    """
+        Creates an individual from the bytes produced by 'encode_layout'
+    """
+    p = pizza
+    dtypes = layout_dtypes(p.n_col, p.n_row, len(p.slices))
+    n = len(data) // sum(dtype.itemsize for dtype in dtypes)
+    arrays, offset = [], 0
+    for dtype in dtypes:
+        arrays.append(np.frombuffer(data, dtype=dtype, count=n, offset=offset).astype(np.int32))
+        offset += n * dtype.itemsize
+    return Individual.from_arrays(*arrays, p.slices, p.n_col, p.n_row, p.L, p.H)
+
+
+def get_targets(n_islands, topology):
+    """
+        Returns the list of islands that receive migrants from each island
+        'ring' -- island n sends to island n+1
+        'all' -- island n sends to every other island
+    """
+    if topology == 'ring':
+        return [[(n + 1) % n_islands] for n in range(n_islands)]
+    elif topology == 'all':
+        return [[m for m in range(n_islands) if m != n] for n in range(n_islands)]
+    raise ValueError("Unknown migration topology '%s'" % topology)
+
+
+def run_islands(inp_fpath, settings, G_max, interval=25, n_migrants=2, topology='ring', seed=0, verbose=DEFAULTS['verbose']):
+    """
+        Runs the island model of the genetic algorithm: each island evolves its own population
+        in a separate process, and every 'interval' generations sends its 'n_migrants' best layouts
+        to the islands defined by 'topology'. Received migrants replace the worst individuals.
+
+        settings, list[dict]
+            one dict per island with keys 'P', 'c_par', 'c_rec', 'c_mut', 'c_ran'
+            (ratios are normalised to sum to 1), and optionally 'selection' (default 'truncation'),
+            'duplicates' (default 'replace'), 'recombination' (default 'quadrant'), 'lns' (default 0)
+            and 'window_cache' (default False), see 'make_next_generation'
+
+        Returns the list of the best individuals of each island.
+        The run is deterministic for a given seed: island n uses seed+n, and migrants
+        are merged in the order of the sending islands.
+        Each island prints its best score every generation if 'verbose' is True.
+        If an island fails or dies, the other islands are terminated and RuntimeError is raised.
+    """
+    n_islands = len(settings)
+    targets = get_targets(n_islands, topology)
+    sources = [[m for m in range(n_islands) if n in targets[m]] for n in range(n_islands)]
+
+    inboxes = [mp.Queue() for _ in range(n_islands)]
+    results = mp.Queue()
+    processes = []
+    for n in range(n_islands):
+        args = (n, inp_fpath, settings[n], G_max, interval, n_migrants,
+                targets[n], len(sources[n]), inboxes, results, seed + n, verbose)
+        processes.append(mp.Process(target=_run_island, args=args))
+    for proc in processes:
+        proc.start()
+
+    best = {}
+    try:
+        while len(best) < n_islands:
+            try:
+                n, data, error = results.get(timeout=1)
+            except queue.Empty:
+                # A finished island has flushed its result before exiting, so a dead island without one has failed
+                for n, proc in enumerate(processes):
+                    if n not in best and not proc.is_alive() and results.empty():
+                        raise RuntimeError("Island %d exited with code %s without a result" % (n, proc.exitcode))
+                continue
+            if error is not None:
+                raise RuntimeError("Island %d failed:\n%s" % (n, error))
+            best[n] = data
+    except BaseException:
+        for proc in processes:
+            proc.terminate()
+        raise
+    finally:
+        for proc in processes:
+            proc.join()
+
+    pizza = read_setup(inp_fpath)[0]
+    return [decode_layout(best[n], pizza) for n in range(n_islands)]
+
+
+def _run_island(n, inp_fpath, params, G_max, interval, n_migrants, targets, n_sources, inboxes, results, seed, verbose):
+    try:
+        best = _evolve_island(n, inp_fpath, params, G_max, interval, n_migrants, targets, n_sources, inboxes, seed, verbose)
+    except Exception:
+        # The parent waits for a result of every island, so a failure is sent instead of one
+        results.put((n, None, traceback.format_exc()))
+        return
+    results.put((n, encode_layout(best), None))
+
+
+def _evolve_island(n, inp_fpath, params, G_max, interval, n_migrants, targets, n_sources, inboxes, seed, verbose):
+    random.seed(seed)
+    window_cache.clear()
+    pizza = read_setup(inp_fpath)[0]
+
+    s = params['c_par'] + params['c_rec'] + params['c_mut'] + params['c_ran']
+    P = params['P']
+    ratios = {key: params[key] / s for key in ['c_par', 'c_rec', 'c_mut', 'c_ran']}
+
+    population = Population()
+    for _ in range(P):
+        A = Individual({}, pizza.slices, pizza.n_col, pizza.n_row, pizza.L, pizza.H)
+        A.fill_layout(pizza)
+        population.append(A)
+    population.sort()
+
+    pending = {}
+    for G in range(1, G_max):
+        population = make_next_generation(population, pizza, None, P, **ratios,
+                                          selection=params.get('selection', 'truncation'),
+                                          duplicates=params.get('duplicates', 'replace'),
+                                          recombination=params.get('recombination', 'quadrant'),
+                                          lns=params.get('lns', 0.0),
+                                          window_cache=params.get('window_cache', False))
+
+        if G % interval == 0 and n_sources:
+            migrants = [encode_layout(A) for A in population[:n_migrants]]
+            for m in targets:
+                inboxes[m].put((G, n, migrants))
+
+            # Islands run at different speeds; migrants of later epochs are kept for later
+            while len(pending.get(G, [])) < n_sources:
+                _G, source, data = inboxes[n].get()
+                pending.setdefault(_G, []).append((source, data))
+
+            for source, data in sorted(pending.pop(G)):
+                population.extend(decode_layout(d, pizza) for d in data)
+            population.sort()
+            population.truncate(P)
+
+        if verbose:
+            print("island %d; %s; %7.4f%%" % (n, G, population[0].efficiency()))
+
+    return population[0]
+
+
+if __name__ == "__main__":
+    settings = [
+        {'P': 50, 'c_par': 0.20, 'c_rec': 0.10, 'c_mut': 0.70, 'c_ran': 0.00},
+        {'P': 50, 'c_par': 0.20, 'c_rec': 0.20, 'c_mut': 0.60, 'c_ran': 0.00},
+        {'P': 50, 'c_par': 0.30, 'c_rec': 0.10, 'c_mut': 0.50, 'c_ran': 0.10},
+        {'P': 50, 'c_par': 0.10, 'c_rec': 0.10, 'c_mut': 0.80, 'c_ran': 0.00},
+    ]
+    best = run_islands("input/c_medium.in", settings, G_max=200, interval=25, n_migrants=2, topology='ring')
+    best.sort(key = lambda x: x.efficiency(), reverse=True)
+    print(best)
+    best[0].save_as_answer("solution.txt")
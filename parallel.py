@@ -0,0 +1,121 @@
+import time
+import random
+from concurrent.futures import ProcessPoolExecutor
+from individual import Individual, RECOMBINATIONS
+from pizza import read_setup
+from instrument import stats
+import solver
+
+
+# Pizza of the worker process, read once by '_init_worker'
+_pizza = None
+
+
+def make_executor(inp_fpath, workers):
+    """
+        Creates a pool of 'workers' processes, each of them reads the pizza from 'inp_fpath' once.
+        The precomputed tables are loaded from the cache next to the input file, see 'read_setup'.
+    """
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(inp_fpath,))
+
+
+def make_offspring(executor, workers, pizza, pool, pairs, mutated, n_ran, recombination='quadrant', lns=0.0, window_cache=False, deadline=None):
+    """
+        Creates the offspring of the individuals of 'pool' in the worker processes:
+        two recombined individuals for each pair of indices (i, j) in 'pairs', a mutant of pool[i]
+        for each index i in 'mutated', and n_ran random individuals.
+        Pairs are recombined with the operator 'recombination', see 'individual.RECOMBINATIONS'.
+        Mutations are large neighbourhood search moves with probability 'lns', and reuse the best known packings
+        of windows if 'window_cache' is True, see 'Individual.mutate'. Each worker process has its own cache.
+        Workers skip their remaining jobs once time.time() exceeds 'deadline', so fewer individuals may be returned.
+        Returns three lists (recombined, mutants, randoms).
+
+        The jobs and their random seeds are drawn from the 'random' state of the calling process,
+        so the result is deterministic for a given seed and number of workers. With 'window_cache' False,
+        it does not depend on the number of workers either; with True, the packings cached by a worker
+        depend on which jobs share its chunk.
+        Parents are sent to the workers as arrays (x, y, k), each parent once per chunk of jobs.
+        Mutants are sent back as the difference to their parent and are applied to a copy-on-write copy of it.
+    """
+    jobs = []
+    for i, j in pairs:
+        jobs.append(('recombine', i, j, random.getrandbits(64)))
+    for i in mutated:
+        jobs.append(('mutate', i, random.choice([1,2,3]), random.getrandbits(64)))
+    for _ in range(n_ran):
+        jobs.append(('random', -1, -1, random.getrandbits(64)))
+
+    encoded = {}
+    futures = []
+    for w in range(workers):
+        chunk = list(range(w, len(jobs), workers))
+        if not chunk:
+            continue
+        parents = {}
+        for n in chunk:
+            kind, i, j, _ = jobs[n]
+            used = [i, j] if kind == 'recombine' else [i] if kind == 'mutate' else []
+            for m in used:
+                if not m in encoded:
+                    encoded[m] = pool[m].to_arrays()
+                parents[m] = encoded[m]
+        futures.append(executor.submit(_run_chunk, [(n, jobs[n]) for n in chunk], parents, recombination, lns, window_cache, deadline))
+
+    results = {}
+    for future in futures:
+        chunk_results, chunk_stats = future.result()
+        results.update(chunk_results)
+        stats.merge(chunk_stats)
+
+    p = pizza
+    recombined, mutants, randoms = [], [], []
+    for n, (kind, i, _, _) in enumerate(jobs):
+        if n not in results:
+            continue
+        if kind == 'recombine':
+            for arrays in results[n]:
+                recombined.append(Individual.from_arrays(*arrays, p.slices, p.n_col, p.n_row, p.L, p.H))
+        elif kind == 'mutate':
+            B = pool[i].copy()
+            B.apply_diff(*results[n])
+            mutants.append(B)
+        else:
+            randoms.append(Individual.from_arrays(*results[n], p.slices, p.n_col, p.n_row, p.L, p.H))
+    return recombined, mutants, randoms
+
+
+def _init_worker(inp_fpath):
+    global _pizza
+    _pizza = read_setup(inp_fpath)[0]
+
+
+def _run_chunk(chunk, parents, recombination, lns, window_cache, deadline=None):
+    """
+        Runs the jobs of one chunk in a worker process, see 'make_offspring'.
+        Returns the results and the snapshot of the timers and counters of the chunk.
+    """
+    p = _pizza
+    stats.reset()
+    # The chunks of a generation may run in any worker process, so each starts with an empty cache
+    solver.window_cache.clear()
+    individuals = {}
+    for i, arrays in parents.items():
+        individuals[i] = Individual.from_arrays(*arrays, p.slices, p.n_col, p.n_row, p.L, p.H)
+
+    results = {}
+    for n, (kind, i, j, seed) in chunk:
+        if deadline is not None and time.time() > deadline:
+            break
+        random.seed(seed)
+        if kind == 'recombine':
+            C, D = RECOMBINATIONS[recombination](individuals[i], individuals[j], p)
+            results[n] = (C.to_arrays(), D.to_arrays())
+        elif kind == 'mutate':
+            B = individuals[i].copy()
+            B.mutate(p, j, lns=lns, cache=window_cache)
+            results[n] = B.diff(individuals[i])
+        else:
+            A = Individual({}, p.slices, p.n_col, p.n_row, p.L, p.H)
+            A.fill_layout(p)
+            results[n] = A.to_arrays()
+    return results, stats.snapshot()
@@ -0,0 +1,207 @@
+import os
+import hashlib
+import zipfile
+import numpy as np
+
+
+def read_setup(fname, cache=True):
+    """
+        Reads the setup from the input file 'fname'.
+        pizza -- preprocessed pizza contents, see 'Pizza'
+        n_row, n_col -- number of rows and columns in pizza
+        L -- minimum amount of each ingridient in a slice
+        H -- maximum size of a slice
+
+        The pizza is parsed straight into a uint8 array. If 'cache' is True, the array is stored
+        next to the input file as 'fname.grid.npy' and memory-mapped on the following calls,
+        so that several processes share the same pages; the table of feasible slices is cached
+        next to the input file as 'fname.feasible.npz'.
+        Cache files are written under a temporary name and then renamed, so concurrent calls never read
+        a partial file; if a cache file can not be written, the data is kept in memory only.
+    """
+    with open(fname, 'rb') as fin:
+        n_row, n_col, L, H = list(map(int, fin.readline().split()))
+        grid = None
+        grid_fname = fname + '.grid.npy'
+        if cache and os.path.exists(grid_fname) and os.path.getmtime(grid_fname) >= os.path.getmtime(fname):
+            try:
+                grid = np.load(grid_fname, mmap_mode='r')
+            except (OSError, ValueError, EOFError):
+                grid = None
+            if grid is not None and grid.shape != (n_row, n_col):
+                grid = None
+
+        if grid is None:
+            data = np.frombuffer(fin.read(), dtype=np.uint8)
+            data = data[(data == ord('T')) | (data == ord('M'))]
+            grid = (data == ord('T')).astype(np.uint8).reshape(n_row, n_col)
+            if cache and _save_atomic(grid_fname, lambda fout: np.save(fout, grid)):
+                grid = np.load(grid_fname, mmap_mode='r')
+
+    feasible_fname = fname + '.feasible.npz' if cache else None
+    return Pizza(grid, L, H, cache_fname=feasible_fname), n_row, n_col, L, H
+
+
+def _save_atomic(fname, write):
+    """
+        Calls write(fout) on a temporary file next to 'fname' and renames it to 'fname'.
+        Returns False, leaving no file behind, if the file can not be written.
+    """
+    tmp_fname = "%s.%d.tmp" % (fname, os.getpid())
+    try:
+        with open(tmp_fname, 'wb') as fout:
+            write(fout)
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(tmp_fname, fname)
+    except OSError:
+        try:
+            os.remove(tmp_fname)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def generate_possible_slices(L, H):
+    """
+        Generates a list of all possible slices based on L and H.
+        Each slice is encoded as (wi, he) - it's width and height, respectively.
+    """
+    n_min = 2 * L
+    n_max = H
+
+    slices = []
+    for he in range(1, n_max+1):
+        for wi in range(max(1, n_min // he), n_max + 1):
+            if he * wi > n_max:
+                break
+            slices.append((wi, he))
+
+    return slices
+
+
+class Pizza:
+    """
+        Preprocessed pizza contents, shared by all individuals of a run
+
+            grid, np.array of uint8, shape (n_row, n_col)
+        pizza contents; 1 for a tomato cell 'T', 0 for a mushroom cell 'M';
+        might be a read-only memory-mapped array, see 'read_setup'
+
+            tomatoes, np.array of int32, shape (n_row+1, n_col+1)
+        summed-area table of tomatoes;
+        tomatoes[j, i] is the number of 'T' cells in the rectangle [0:i) x [0:j)
+
+            n_col, n_row, int
+        number of columns and rows in pizza
+
+            L, int
+        minimum number of each ingridient in a slice
+
+            H, int
+        maximum size of a slice
+
+            slices, list[(int, int)]
+        list of all possible slices with these L and H, see 'generate_possible_slices'
+
+            feasible, np.array of bool, shape (n_row, n_col, len(slices))
+        feasible[y, x, k] is True if slice k placed with its upper left cell at (x, y)
+        is within the pizza boundaries and has enough of M and T contents
+
+        If 'cache_fname' is given, 'feasible' is loaded from that file when it matches the pizza,
+        otherwise it is computed and saved there as a packed bit array.
+    """
+    def __init__(self, grid, L, H, cache_fname=None):
+        self.n_row, self.n_col = grid.shape
+        self.L = L
+        self.H = H
+        self.slices = generate_possible_slices(L, H)
+        self.grid = grid
+
+        self.tomatoes = np.zeros((self.n_row + 1, self.n_col + 1), dtype=np.int32)
+        self.tomatoes[1:, 1:] = self.grid.cumsum(axis=0, dtype=np.int32).cumsum(axis=1, dtype=np.int32)
+
+        self.feasible = None
+        if cache_fname is not None:
+            self.feasible = self.__load_feasible(cache_fname)
+        if self.feasible is None:
+            self.feasible = self.__compute_feasible()
+            if cache_fname is not None:
+                self.__save_feasible(cache_fname)
+
+
+    def count_tomatoes(self, x, y, wi, he):
+        """
+            Returns the number of 'T' cells in the slice (wi, he) placed at (x, y) in O(1)
+        """
+        s = self.tomatoes
+        return int(s[y + he, x + wi] - s[y, x + wi] - s[y + he, x] + s[y, x])
+
+
+    def enough_contents(self, x, y, wi, he):
+        """
+            Checks, if the slice (wi, he) placed at (x, y) would have enough of M and T contents
+        """
+        T = self.count_tomatoes(x, y, wi, he)
+        M = wi * he - T
+        return (T >= self.L) and (M >= self.L)
+
+
+    def legal_slices(self, x, y):
+        """
+            Returns the list of slice indices k that can be placed with the upper left cell at (x, y)
+        """
+        return np.flatnonzero(self.feasible[y, x]).tolist()
+
+
+    def digest(self):
+        """
+            Returns the hash of the pizza contents and parameters, used to validate cached data
+        """
+        h = hashlib.sha1(np.ascontiguousarray(self.grid).tobytes())
+        h.update(("%d %d %d %d" % (self.n_row, self.n_col, self.L, self.H)).encode('ascii'))
+        return h.hexdigest()
+
+
+    ###########################################################################
+
+    def __compute_feasible(self):
+        """
+            Checks all (cell, slice) pairs at once with the summed-area table
+        """
+        s = self.tomatoes
+        feasible = np.zeros((self.n_row, self.n_col, len(self.slices)), dtype=bool)
+        for k, (wi, he) in enumerate(self.slices):
+            if wi > self.n_col or he > self.n_row:
+                continue
+            T = s[he:, wi:] - s[:-he, wi:] - s[he:, :-wi] + s[:-he, :-wi]
+            M = wi * he - T
+            feasible[:self.n_row - he + 1, :self.n_col - wi + 1, k] = (T >= self.L) & (M >= self.L)
+        return feasible
+
+
+    def __load_feasible(self, fname):
+        """
+            Returns the cached table, or None if the file is missing, does not match the pizza, or can not be read
+        """
+        if not os.path.exists(fname):
+            return None
+        try:
+            with np.load(fname) as data:
+                if str(data['digest']) != self.digest():
+                    return None
+                packed = data['packed']
+            feasible = np.unpackbits(packed, axis=-1, count=len(self.slices)).astype(bool)
+        except (OSError, ValueError, EOFError, KeyError, zipfile.BadZipFile):
+            return None
+        if feasible.shape != (self.n_row, self.n_col, len(self.slices)):
+            return None
+        return feasible
+
+
+    def __save_feasible(self, fname):
+        """
+            Saves the table through a temporary file, see '_save_atomic'; a failed write is ignored
+        """
+        _save_atomic(fname, lambda fout: np.savez_compressed(fout, digest=self.digest(), packed=np.packbits(self.feasible, axis=-1)))
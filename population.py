@@ -0,0 +1,113 @@
+import numpy as np
+
+
+class Population:
+    """
+        Container of individuals that keeps their scores in a NumPy array,
+        so that sorting, selection and statistics are single vectorised calls.
+
+            individuals, list[Individual]
+        individuals of the population
+
+            scores, np.array of int64
+        scores[i] is the score of individuals[i], recorded when the individual is added;
+        call 'update' after changing an individual of the population in place
+
+        Indexing with an int returns an individual, indexing with a slice returns a list of individuals.
+    """
+    def __init__(self, individuals=()):
+        self.individuals = list(individuals)
+        self.scores = np.array([A.score() for A in self.individuals], dtype=np.int64)
+
+
+    def __len__(self):
+        return len(self.individuals)
+
+
+    def __getitem__(self, i):
+        return self.individuals[i]
+
+
+    def __iter__(self):
+        return iter(self.individuals)
+
+
+    def append(self, A):
+        self.individuals.append(A)
+        self.scores = np.append(self.scores, A.score())
+
+
+    def extend(self, individuals):
+        individuals = list(individuals)
+        self.individuals += individuals
+        self.scores = np.concatenate([self.scores, [A.score() for A in individuals]]).astype(np.int64)
+
+
+    def update(self, i):
+        """
+            Records the score of the i-th individual again, after it was changed in place
+        """
+        self.scores[i] = self.individuals[i].score()
+
+
+    def sort(self):
+        """
+            Sorts the population from the best to the worst; individuals with equal scores keep their order
+        """
+        order = np.argsort(-self.scores, kind='stable')
+        self.individuals = [self.individuals[i] for i in order]
+        self.scores = self.scores[order]
+
+
+    def truncate(self, n):
+        """
+            Keeps only the first n individuals
+        """
+        del self.individuals[n:]
+        self.scores = self.scores[:n]
+
+
+    def top(self, k):
+        """
+            Returns the indices of the k best individuals, from the best to the worst, without sorting the population
+        """
+        return np.argsort(-self.scores, kind='stable')[:max(k, 0)]
+
+
+    def take(self, idx):
+        """
+            Returns a new population of the individuals with the given indices
+        """
+        other = Population.__new__(Population)
+        other.individuals = [self.individuals[i] for i in idx]
+        other.scores = self.scores[np.asarray(idx, dtype=np.int64)]
+        return other
+
+
+    def duplicates(self):
+        """
+            Returns the boolean mask of individuals whose layout equals the layout of an individual
+            earlier in the population, compared by 'Individual.layout_hash'
+        """
+        hashes = np.array([A.layout_hash for A in self.individuals], dtype=np.uint64)
+        mask = np.ones(len(hashes), dtype=bool)
+        mask[np.unique(hashes, return_index=True)[1]] = False
+        return mask
+
+
+    def best(self):
+        return self.individuals[int(np.argmax(self.scores))]
+
+
+    def stats(self):
+        """
+            Returns the statistics of the population scores:
+            best, mean, std -- of the scores
+            diversity -- fraction of distinct scores in the population
+        """
+        if not len(self.scores):
+            return {'best': 0, 'mean': 0.0, 'std': 0.0, 'diversity': 0.0}
+        return {'best': int(self.scores.max()),
+                'mean': float(self.scores.mean()),
+                'std': float(self.scores.std()),
+                'diversity': len(np.unique(self.scores)) / len(self.scores)}
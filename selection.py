@@ -0,0 +1,72 @@
+import random
+import numpy as np
+
+
+def select(scores, n, method, **kwargs):
+    """
+        Selects n parents from the population with the given 'scores' array.
+        Returns an array of n indices into the population, in random order.
+
+        method -- one of:
+            'tournament' -- the best of 'size' (default 2) uniformly drawn individuals, see 'tournament'
+            'rank' -- linear ranking with the selection pressure 's' (default 1.5), see 'rank'
+            'sus' -- fitness-proportional with windowing, see 'proportional'
+        Both 'rank' and 'sus' sample with the stochastic universal sampling, see 'sus'.
+        Apart from the argsort of 'rank', every method costs O(P + n).
+
+        The random generator is seeded from the 'random' module, so the selection is reproducible with it.
+    """
+    rng = np.random.default_rng(random.getrandbits(64))
+    if method == 'tournament':
+        return tournament(scores, n, rng, **kwargs)
+    elif method == 'rank':
+        return rank(scores, n, rng, **kwargs)
+    elif method == 'sus':
+        return proportional(scores, n, rng)
+    raise ValueError("Unknown selection method '%s'" % method)
+
+
+def tournament(scores, n, rng, size=2):
+    """
+        Tournament selection: each parent is the best of 'size' individuals drawn with replacement.
+        Costs O(n * size).
+    """
+    idx = rng.integers(0, len(scores), size=(n, size))
+    return idx[np.arange(n), np.argmax(scores[idx], axis=1)]
+
+
+def rank(scores, n, rng, s=1.5):
+    """
+        Linear ranking selection [1, p. 82]: the individual of rank r (0 for the worst, mu-1 for the best)
+        is selected with probability (2 - s) / mu + 2 * r * (s - 1) / (mu * (mu - 1)), 1 < s <= 2.
+    """
+    mu = len(scores)
+    if mu == 1:
+        return np.zeros(n, dtype=np.int64)
+    ranks = np.empty(mu, dtype=np.int64)
+    ranks[np.argsort(scores, kind='stable')] = np.arange(mu)
+    weights = (2 - s) / mu + 2 * ranks * (s - 1) / (mu * (mu - 1))
+    return sus(weights, n, rng)
+
+
+def proportional(scores, n, rng):
+    """
+        Fitness-proportional selection with windowing [1, p. 81]: the weight of an individual is
+        its score minus the worst score of the population (plus one, so that every individual has a chance).
+        All scores of a population are usually close, so the plain scores would give a nearly uniform selection.
+    """
+    weights = scores - scores.min() + 1
+    return sus(weights, n, rng)
+
+
+def sus(weights, n, rng):
+    """
+        Stochastic universal sampling: n equally spaced pointers with a single random offset
+        over the cumulative weights. Individual i is selected floor(n * w_i / sum(w)) or one more times.
+        Costs O(len(weights) + n).
+    """
+    cum = np.cumsum(weights, dtype=np.float64)
+    cum *= n / cum[-1]
+    hits = np.floor(cum - rng.random()).astype(np.int64) + 1
+    counts = np.diff(np.concatenate([[0], np.clip(hits, 0, n)]))
+    return rng.permutation(np.repeat(np.arange(len(weights)), counts))
@@ -0,0 +1,199 @@
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from instrument import stats, timed
+
+
+# Maximum number of windows kept by 'window_cache'
+CACHE_SIZE = 10000
+
+
+class SearchLimit(Exception):
+    pass
+
+
+class WindowCache:
+    """
+        Bounded LRU cache of the best known packings of windows, see 'window_key'.
+        Shared by 'solve_region' (exact packings) and 'Individual.fill_layout' (greedy packings).
+
+        An entry is (used, packing, exact): the number of cells used by the packing,
+        the packing [(i, j, k), ...] relative to the upper left cell of the window, and True if it is optimal.
+        A stored packing is replaced only by one that uses more cells, or by an optimal one.
+        Hits, misses and evictions are counted in 'stats' as 'cache_hits', 'cache_misses' and 'cache_evictions'.
+
+        Hits change the result and the use of the 'random' state, so a seeded run clears the cache first,
+        see 'genetic.run', 'islands._run_island' and 'parallel._run_chunk'.
+    """
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+
+    def get(self, key, exact=False):
+        """
+            Returns the entry of 'key', or None if there is none (or it is not optimal while 'exact' is True)
+        """
+        entry = self.entries.get(key)
+        if entry is None or (exact and not entry[2]):
+            stats.add('cache_misses')
+            return None
+        stats.add('cache_hits')
+        self.entries.move_to_end(key)
+        return entry
+
+
+    def put(self, key, used, packing, exact=False):
+        entry = self.entries.get(key)
+        if entry is not None and (entry[2] or (entry[0] >= used and not exact)):
+            return
+        self.entries[key] = (used, packing, exact)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            stats.add('cache_evictions')
+
+
+    def clear(self):
+        self.entries.clear()
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+window_cache = WindowCache()
+
+
+def window_key(pizza, rect, occupied):
+    """
+        Returns the key of the window rect = (x0, y0, x1, y1) of the pizza with the mask of 'occupied' cells:
+        a 128-bit hash of L, H, the shape and the contents of the window and the mask.
+        Windows with equal keys have the same packings, wherever they are on the pizza.
+    """
+    x0, y0, x1, y1 = rect
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.array([pizza.L, pizza.H, x1 - x0, y1 - y0], dtype=np.int32).tobytes())
+    h.update(np.ascontiguousarray(pizza.grid[y0:y1, x0:x1]).tobytes())
+    h.update(np.packbits(occupied).tobytes())
+    return h.digest()
+
+
+@timed('solve_region')
+def solve_region(A, pizza, rect, max_states=20000):
+    """
+        Packs the region rect = (x0, y0, x1, y1) of individual A optimally (a large neighbourhood search move).
+        Slices of A that lie strictly within the region are replaced by the packing of the region with
+        the maximum number of used cells; slices that cross the border of the region are kept.
+        A is changed only if the packing uses more cells. Returns the number of cells gained.
+
+        The packing is found exactly by a memoised search over the occupancy masks of the region, see 'pack_window';
+        the search is abandoned, and A left unchanged, if it visits more than 'max_states' masks.
+        Optimal packings are kept in 'window_cache' by the contents of the window and its blocked cells,
+        so a repeated window is not solved again.
+    """
+    x0, y0, x1, y1 = rect
+    wi, he = x1 - x0, y1 - y0
+    owners = A.grid.window(x0, y0, wi, he)
+
+    inside, blocked = [], owners != -1
+    for owner in np.unique(owners[blocked]).tolist():
+        x, y = owner % A.n_col, owner // A.n_col
+        s_wi, s_he = A.slices[A.layout[(x, y)]]
+        if x >= x0 and y >= y0 and x + s_wi <= x1 and y + s_he <= y1:
+            inside.append((x, y))
+            blocked[y - y0:y - y0 + s_he, x - x0:x - x0 + s_wi] = False
+    used = int((owners != -1).sum() - blocked.sum())
+
+    key = window_key(pizza, rect, blocked)
+    entry = window_cache.get(key, exact=True)
+    if entry is not None:
+        solution = entry[1]
+    else:
+        try:
+            solution = pack_window(pizza.feasible[y0:y1, x0:x1], A.slices, blocked, max_states)
+        except SearchLimit:
+            stats.add('solve_aborted')
+            return 0
+        window_cache.put(key, sum(A.slices[k][0] * A.slices[k][1] for _, _, k in solution), solution, exact=True)
+
+    gain = sum(A.slices[k][0] * A.slices[k][1] for _, _, k in solution) - used
+    if gain <= 0:
+        return 0
+    A.apply_diff(inside, [((x0 + i, y0 + j), k) for i, j, k in solution])
+    stats.add('solve_gain', gain)
+    return gain
+
+
+def pack_window(feasible, slices, blocked, max_states=20000):
+    """
+        Returns the packing [(i, j, k), ...] of the window with the maximum number of used cells:
+        slice k at (i, j) relative to the upper left cell of the window, within the window and off the blocked cells.
+
+            feasible, np.array of bool (he, wi, n_slices)
+        slices that satisfy the contents condition at each cell of the window, see 'Pizza.feasible'
+            blocked, np.array of bool (he, wi)
+        cells that may not be used
+
+        The cells are decided in row-major order. The first undecided cell is either left empty or becomes
+        the upper left cell of a slice, and the best value of the rest depends only on the mask of decided cells,
+        so it is memoised by that mask. Raises SearchLimit after 'max_states' masks.
+    """
+    he, wi = blocked.shape
+    n = he * wi
+    full = (1 << n) - 1
+
+    # options[c] -- the (mask, area, k) of every slice that may start at cell c
+    options = []
+    for j in range(he):
+        for i in range(wi):
+            opts = []
+            if not blocked[j, i]:
+                for k in np.flatnonzero(feasible[j, i]).tolist():
+                    s_wi, s_he = slices[k]
+                    if i + s_wi > wi or j + s_he > he or blocked[j:j + s_he, i:i + s_wi].any():
+                        continue
+                    row = ((1 << s_wi) - 1) << i
+                    mask = 0
+                    for r in range(j, j + s_he):
+                        mask |= row << (r * wi)
+                    opts.append((mask, s_wi * s_he, k))
+            options.append(opts)
+
+    # Cells that no slice can cover are decided from the start
+    coverable = 0
+    for opts in options:
+        for mask, _, _ in opts:
+            coverable |= mask
+    start = full & ~coverable
+
+    memo = {full: (0, None)}
+    def best(mask):
+        if mask in memo:
+            return memo[mask][0]
+        if len(memo) > max_states:
+            raise SearchLimit()
+        c = (~mask & (mask + 1)).bit_length() - 1
+        value, choice = best(mask | (1 << c)), None
+        bound = bin(full & ~mask).count('1')
+        for opt in options[c]:
+            if value == bound:
+                break
+            if not opt[0] & mask:
+                v = opt[1] + best(mask | opt[0])
+                if v > value:
+                    value, choice = v, opt
+        memo[mask] = (value, choice)
+        return value
+
+    best(start)
+    solution, mask = [], start
+    while mask != full:
+        choice = memo[mask][1]
+        c = (~mask & (mask + 1)).bit_length() - 1
+        if choice is None:
+            mask |= 1 << c
+        else:
+            solution.append((c % wi, c // wi, choice[2]))
+            mask |= choice[0]
+    return solution
@@ -1,3 +1,9 @@
+import numpy as np
+
+
+PATTERNS = ['left', 'upper', 'upper-left', 'upper-right', 'bottom-left', 'bottom-right', 'cross']
+
+
 def get_sublayout_n(pattern, x, y, wi, he, s_v, s_h):
     """
         A function that returns the sublayout number for the given input pattern key
@@ -49,6 +55,27 @@ def get_sublayout_n(pattern, x, y, wi, he, s_v, s_h):
     return -1
 
 
+def _make_table(pattern):
+    """
+        Tabulates 'get_sublayout_n' for the pattern by the position of a slice relative to each line:
+        0 -- before the line, 1 -- after the line, 2 -- crossing the line
+    """
+    spans = [(0, 1), (1, 1), (0, 2)] # (x, wi) or (y, he) of each position for the line at 1
+    return np.array([[get_sublayout_n(pattern, x, y, wi, he, 1, 1) for y, he in spans] for x, wi in spans], dtype=np.int8)
+
+
+PATTERN_TABLES = {pattern: _make_table(pattern) for pattern in PATTERNS}
+
+
+def get_sublayouts_n(pattern, x, y, wi, he, s_v, s_h):
+    """
+        Vectorised 'get_sublayout_n': returns the array of sublayout numbers of slices given by arrays x, y, wi, he
+    """
+    h = np.where(x + wi <= s_v, 0, np.where(x >= s_v, 1, 2))
+    v = np.where(y + he <= s_h, 0, np.where(y >= s_h, 1, 2))
+    return PATTERN_TABLES[pattern][h, v]
+
+
 
 if __name__ == "__main__":
     print("Testing the 'get_sublayout_n' procedure")
@@ -110,6 +137,7 @@ if __name__ == "__main__":
         x = pos - y * 4
         for pattern in test_cases[pos]:
             assert(get_sublayout_n(pattern, x, y, wi, he, s_v, s_h) == test_cases[pos][pattern])
+            assert(get_sublayouts_n(pattern, np.array([x]), np.array([y]), wi, he, s_v, s_h)[0] == test_cases[pos][pattern])
     
     print("Everything is correct!")
     print(test_cases[0].keys())
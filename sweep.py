@@ -0,0 +1,72 @@
+import os
+import csv
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from genetic import load_config, run, tomllib, i2s
+
+
+# Settings that are file names; a run directory is named after their base name without the extension
+PATH_SETTINGS = ['input', 'history', 'run_log']
+
+
+def make_configs(base, sweep):
+    """
+        Returns the list of run settings for every combination of the values in 'sweep':
+            base, dict -- settings shared by all runs, see 'genetic.load_config'
+            sweep, dict of lists -- values of the swept settings, e.g. {'P': [100, 200], 'selection': ['rank', 'sus']}
+        Each run writes into its own directory 'res_path/<n>_<setting>=<value>_.../', where n is the index of the run.
+    """
+    keys = sorted(sweep)
+    combinations = list(itertools.product(*(sweep[key] for key in keys)))
+    configs = []
+    for n, values in enumerate(combinations):
+        name = "_".join("%s=%s" % (key, os.path.splitext(os.path.basename(str(value)))[0] if key in PATH_SETTINGS else value)
+                        for key, value in zip(keys, values))
+        overrides = dict(zip(keys, values))
+        name = i2s(n, len(str(len(combinations) - 1))) + ("_" + name if name else "")
+        res_path = os.path.join(base.get('res_path', "results/"), name) + "/"
+        configs.append(load_config(**{**base, **overrides, 'res_path': res_path}))
+    return configs
+
+
+def run_sweep(configs, jobs):
+    """
+        Runs the genetic algorithm for each of the 'configs', 'jobs' runs at a time in separate processes.
+        Returns the list of summaries of the runs, in the order of 'configs'.
+    """
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(_run_one, configs))
+
+
+def _run_one(config):
+    t = time.time()
+    best = run(config)
+    return {'res_path': config['res_path'], 'score': best.score(), 'efficiency': best.efficiency(), 'time': time.time() - t}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs the genetic algorithm for all combinations of the swept settings")
+    parser.add_argument('config', help="TOML file with the shared settings and a [sweep] table of lists of values")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="number of runs executed in parallel")
+    args = parser.parse_args()
+
+    if tomllib is None:
+        raise ImportError("Reading config files requires Python 3.11 or later")
+    with open(args.config, 'rb') as fin:
+        base = tomllib.load(fin)
+    sweep = base.pop('sweep', {})
+    base.setdefault('verbose', False)
+
+    configs = make_configs(base, sweep)
+    print("%d runs, %d in parallel" % (len(configs), args.jobs))
+    summaries = run_sweep(configs, args.jobs)
+
+    fname = os.path.join(base.get('res_path', "results/"), "sweep.csv")
+    with open(fname, 'w', newline='') as fout:
+        writer = csv.DictWriter(fout, fieldnames=['res_path', 'score', 'efficiency', 'time'])
+        writer.writeheader()
+        writer.writerows(summaries)
+    for summary in summaries:
+        print("%s; %7.4f%%; %.1f s" % (summary['res_path'], summary['efficiency'], summary['time']))
@@ -0,0 +1,151 @@
+"""
+    Benchmark of the hot paths of 'Individual' and of the population checkpoints.
+
+    Run from the repository root:
+        python tests/benchmark.py [--inputs a_example b_small c_medium d_big] [--min-time 1.0] [--compare old.json]
+
+    Every operation is timed on every input; the results (time per call, individuals and cells per second,
+    peak memory of one call) are printed and saved as JSON into 'tests/benchmarks/<commit>.json'.
+    '--compare' prints the ratio of the times to an earlier result file.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+import numpy as np
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import genetic
+from individual import Individual
+from pizza import read_setup
+
+
+def new_individual(pizza):
+    return Individual({}, pizza.slices, pizza.n_col, pizza.n_row, pizza.L, pizza.H)
+
+
+def filled_individual(pizza):
+    A = new_individual(pizza)
+    A.fill_layout(pizza)
+    return A
+
+
+def make_cases(pizza, tmp_path, P_backup):
+    """
+        Returns the list of benchmark cases (name, setup, run, n_individuals):
+        setup() prepares the arguments of one call and is not timed, run(*args) is timed
+    """
+    p = pizza
+    A, B = filled_individual(p), filled_individual(p)
+    A.copy() # builds the index of empty cells
+    lay = dict(A.layout.items())
+    x, y, k = A.to_arrays()
+    population = [filled_individual(p) for _ in range(P_backup)]
+    backup = os.path.join(tmp_path, "generations_backup", "G_0000.npz")
+
+    def mutate(levels):
+        return ('mutate_%d' % levels, lambda: (A.copy(),), lambda C: C.mutate(p, levels), 1)
+
+    return [
+        ('fill_layout', lambda: (new_individual(p),), lambda C: C.fill_layout(p), 1),
+        mutate(1), mutate(2), mutate(3),
+        ('mutate_lns', lambda: (A.copy(),), lambda C: C.mutate(p, lns=1.0), 1),
+        ('recombine', lambda: (), lambda: A.recombine(B, p), 2),
+        ('copy', lambda: (), lambda: A.copy(), 1),
+        ('init_from_layout', lambda: (), lambda: Individual(lay, p.slices, p.n_col, p.n_row, p.L, p.H), 1),
+        ('from_arrays', lambda: (), lambda: Individual.from_arrays(x, y, k, p.slices, p.n_col, p.n_row, p.L, p.H), 1),
+        ('save_population', lambda: (), lambda: genetic.save_population(population, 0, p, tmp_path), P_backup),
+        ('load_population', lambda: (), lambda: genetic.load_population(backup, p), P_backup),
+    ]
+
+
+def measure(setup, run, min_time, max_calls):
+    """
+        Calls run(*setup()) until 'min_time' seconds are spent in 'run' (at least 3 and at most 'max_calls' times).
+        Returns the list of times of the calls and the peak memory of one more call, traced by 'tracemalloc'.
+    """
+    times = []
+    while len(times) < 3 or (sum(times) < min_time and len(times) < max_calls):
+        args = setup()
+        t = time.perf_counter()
+        run(*args)
+        times.append(time.perf_counter() - t)
+
+    args = setup()
+    tracemalloc.start()
+    run(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return times, peak
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_benchmarks(inputs, min_time=1.0, max_calls=1000, P_backup=10, seed=0):
+    results = []
+    for name in inputs:
+        pizza = read_setup(os.path.join(root, "input", name + ".in"))[0]
+        n_cells = pizza.n_row * pizza.n_col
+        random.seed(seed)
+        with tempfile.TemporaryDirectory() as tmp_path:
+            os.makedirs(os.path.join(tmp_path, "generations_backup"))
+            for case, setup, run, n_ind in make_cases(pizza, tmp_path + os.sep, P_backup):
+                times, peak = measure(setup, run, min_time, max_calls)
+                median = float(np.median(times))
+                res = {'input': name, 'case': case, 'calls': len(times),
+                       'min_s': min(times), 'median_s': median,
+                       'individuals_per_s': n_ind / median, 'cells_per_s': n_ind * n_cells / median,
+                       'peak_bytes': peak}
+                results.append(res)
+                print("%-10s %-17s %6d calls; median %10.6f s; %10.1f ind/s; %12.0f cells/s; peak %8.1f KB" %
+                      (name, case, len(times), median, res['individuals_per_s'], res['cells_per_s'], peak / 1024))
+    return results
+
+
+def compare(results, fname):
+    with open(fname, 'r') as fin:
+        old = {(r['input'], r['case']): r for r in json.load(fin)['results']}
+    print("\nMedian time relative to '%s' (< 1 is faster):" % fname)
+    for r in results:
+        o = old.get((r['input'], r['case']))
+        if o is not None:
+            print("%-10s %-17s %6.2f" % (r['input'], r['case'], r['median_s'] / o['median_s']))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the Individual hot paths")
+    parser.add_argument('--inputs', nargs='+', default=['a_example', 'b_small', 'c_medium', 'd_big'])
+    parser.add_argument('--min-time', type=float, default=1.0, help="seconds spent in each case per input")
+    parser.add_argument('--max-calls', type=int, default=1000)
+    parser.add_argument('--backup-size', type=int, default=10, help="population size for save/load_population")
+    parser.add_argument('--out', default=None, help="result file, 'tests/benchmarks/<commit>.json' by default")
+    parser.add_argument('--compare', default=None, help="earlier result file to compare with")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.inputs, args.min_time, args.max_calls, args.backup_size)
+
+    commit = get_commit()
+    out = args.out or os.path.join(root, "tests", "benchmarks", commit + ".json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w') as fout:
+        json.dump({'commit': commit, 'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'python': platform.python_version(), 'numpy': np.__version__,
+                   'machine': platform.machine(), 'processor': platform.processor(),
+                   'results': results}, fout, indent=1)
+    print("Saved to '%s'" % out)
+
+    if args.compare:
+        compare(results, args.compare)
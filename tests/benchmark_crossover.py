@@ -0,0 +1,71 @@
+"""
+    Benchmark of the recombination operators, see 'individual.RECOMBINATIONS'.
+
+    Run from the repository root:
+        python tests/benchmark_crossover.py [--inputs c_medium d_big] [--parents 4] [--pairs 10]
+
+    For every input, the same random parents and pairs are recombined by every operator.
+    Reports children per second and the efficiency of the children compared to their parents,
+    and saves the results as JSON into 'tests/benchmarks/crossover_<commit>.json'.
+"""
+import os
+import json
+import time
+import random
+import argparse
+import numpy as np
+
+from benchmark import root, get_commit, filled_individual
+from individual import RECOMBINATIONS
+from pizza import read_setup
+
+
+def run_crossover_benchmark(inputs, n_parents=4, n_pairs=10, seed=0):
+    results = []
+    for name in inputs:
+        pizza = read_setup(os.path.join(root, "input", name + ".in"))[0]
+        random.seed(seed)
+        parents = [filled_individual(pizza) for _ in range(n_parents)]
+        pairs = [random.sample(range(n_parents), 2) for _ in range(n_pairs)]
+
+        for method, recombine in RECOMBINATIONS.items():
+            random.seed(seed)
+            t_total, effs, gains = 0.0, [], []
+            for i, j in pairs:
+                A, B = parents[i], parents[j]
+                t = time.perf_counter()
+                C, D = recombine(A, B, pizza)
+                t_total += time.perf_counter() - t
+                effs += [C.efficiency(), D.efficiency()]
+                gains += [C.efficiency() - max(A.efficiency(), B.efficiency()),
+                          D.efficiency() - max(A.efficiency(), B.efficiency())]
+
+            res = {'input': name, 'method': method, 'children': len(effs),
+                   'children_per_s': len(effs) / t_total,
+                   'parent_efficiency': float(np.mean([A.efficiency() for A in parents])),
+                   'child_efficiency': float(np.mean(effs)),
+                   'child_efficiency_max': float(np.max(effs)),
+                   'gain_over_best_parent': float(np.mean(gains))}
+            results.append(res)
+            print("%-10s %-9s %8.2f children/s; child %7.4f%% (max %7.4f%%), parents %7.4f%%, gain %+7.4f%%" %
+                  (name, method, res['children_per_s'], res['child_efficiency'], res['child_efficiency_max'],
+                   res['parent_efficiency'], res['gain_over_best_parent']))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the recombination operators")
+    parser.add_argument('--inputs', nargs='+', default=['c_medium', 'd_big'])
+    parser.add_argument('--parents', type=int, default=4, help="number of random parents per input")
+    parser.add_argument('--pairs', type=int, default=10, help="number of recombined pairs per operator")
+    parser.add_argument('--out', default=None, help="result file, 'tests/benchmarks/crossover_<commit>.json' by default")
+    args = parser.parse_args()
+
+    results = run_crossover_benchmark(args.inputs, args.parents, args.pairs)
+
+    commit = get_commit()
+    out = args.out or os.path.join(root, "tests", "benchmarks", "crossover_" + commit + ".json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w') as fout:
+        json.dump({'commit': commit, 'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}, fout, indent=1)
+    print("Saved to '%s'" % out)
@@ -2,60 +2,16 @@ import random
 import codecs
 import numpy as np
 import matplotlib.pyplot as plt
+from pizza import read_setup, generate_possible_slices
 # random.seed(0)
 
 
-def read_setup(fname):
-    """
-    Reading the setup from the input file 'fname'.
-    pizza -- 2D list of pizza contents
-    n_row, n_col -- number of rows and columns in pizza
-    L -- minimum amount of each ingridient in a slice
-    H -- maximum size of a slice
-    """
-    with codecs.open(fname, 'r') as fin:
-        n_row, n_col, L, H = list(map(int, fin.readline().split()))
-
-        pizza = []
-        for _ in range(n_row):
-            line = fin.readline().strip()
-            pizza.append(line)
-
-    return pizza, n_row, n_col, L, H
-
-
-def generate_possible_slices(_L, _H):
-    """
-    Generates a list of all possible slices based on _L and _H.
-    Each slice is encoded as (l, h) - it's length and height, respectively.
-    """
-    n_min = 2 * _L
-    n_max = _H
-
-    slices = []
-    for h in range(1, n_max+1):
-        for l in range(max(1, n_min // h), n_max + 1):
-            if h*l > n_max:
-                break
-            slices.append((l,h))
-
-    return slices
-
-
 def draw_pizza(pizza):
     """
     Draws the image of pizza into the "img_pizza.pdf" as 2D colormap
     """
-    n_row = len(pizza)
-    n_col = len(pizza[0])
-
-    mtr = np.zeros((n_row, n_col), dtype=int)
-    for i in range(n_row):
-        row = pizza[i]
-        _row = row.replace('T', '1')
-        _row = _row.replace('M', '0')
-        _row = list(map(int, list(_row)))
-        mtr[i] = np.array(_row)
+    n_row, n_col = pizza.n_row, pizza.n_col
+    mtr = np.asarray(pizza.grid, dtype=int)
 
     scale = 8 / max(n_row, n_col)
     # print((n_row * scale, n_col * scale))
@@ -130,25 +86,6 @@ def collides_w_used(c_empty, x, y, l, h, n_col):
     return False
 
 
-def enough_contents(pizza, _L, x, y, l, h):
-    """
-    Checks, if the slice (l, h) placed at (x, y) would have enough of M and T contents
-    """
-    T = 0
-    M = 0
-    
-    for i in range(y, y+h):
-        for j in range(x, x+l):
-            v = pizza[i][j]
-            # assert(v in ['T', 'M'])
-            if v == 'T':
-                T += 1
-            else:
-                M += 1
-
-    return (T >= _L) and (M >= _L)
-
-
 def fill_empty_used(layout, slices, n_col, n_row):
     """
     The procedure fills lists 'c_empty' and 'c_slice' based on the input layout
@@ -206,7 +143,7 @@ def generate_layout(pizza, _L, layout, slices, n_col, n_row):
         random.shuffle(i_slice)
         for k in i_slice:
             l, h = slices[k]
-            if exceeds_boundary(x, y, l, h, n_col, n_row) or collides_w_used(c_empty, x, y, l, h, n_col) or not enough_contents(pizza, _L, x, y, l, h):
+            if exceeds_boundary(x, y, l, h, n_col, n_row) or collides_w_used(c_empty, x, y, l, h, n_col) or not pizza.enough_contents(x, y, l, h):
                 # Impossible to place slice k here
                 continue
             else:
@@ -0,0 +1,55 @@
+import random
+import numpy as np
+import pytest
+from individual import Individual
+from pizza import Pizza
+from genetic import save_population, load_population
+
+
+def make_population(pizza, P):
+    population = []
+    for _ in range(P):
+        A = Individual({}, pizza.slices, pizza.n_col, pizza.n_row, pizza.L, pizza.H)
+        A.fill_layout(pizza)
+        population.append(A)
+    return population
+
+
+def test_checkpoint_round_trip(tmp_path):
+    random.seed(0)
+    rng = np.random.default_rng(0)
+    pizza = Pizza(rng.integers(0, 2, (30, 40)).astype(np.uint8), 1, 6)
+    population = make_population(pizza, 5)
+    res_path = str(tmp_path) + "/"
+    (tmp_path / "generations_backup").mkdir()
+
+    save_population(population, 7, pizza, res_path)
+    expected = [random.random() for _ in range(10)]
+    random.seed(1)
+
+    fname = res_path + "generations_backup/G_0007.npz"
+    with np.load(fname) as data:
+        assert data['x'].dtype == data['y'].dtype == data['k'].dtype == np.uint8
+    loaded = load_population(fname, pizza)
+    assert [random.random() for _ in range(10)] == expected
+
+    assert len(loaded) == len(population)
+    for A, B in zip(population, loaded):
+        assert A.score() == B.score()
+        assert dict(A.layout.items()) == dict(B.layout.items())
+        assert B.check_correctness(pizza)
+
+
+def test_checkpoint_of_another_pizza_is_rejected(tmp_path):
+    random.seed(0)
+    rng = np.random.default_rng(0)
+    pizza = Pizza(rng.integers(0, 2, (30, 40)).astype(np.uint8), 1, 6)
+    res_path = str(tmp_path) + "/"
+    (tmp_path / "generations_backup").mkdir()
+    save_population(make_population(pizza, 2), 0, pizza, res_path)
+
+    grid = pizza.grid.copy()
+    grid[0, 0] = 1 - grid[0, 0]
+    for other in [Pizza(grid, 1, 6), Pizza(pizza.grid.copy(), 2, 6)]:
+        with pytest.raises(ValueError):
+            load_population(res_path + "generations_backup/G_0000.npz", other)
@@ -0,0 +1,71 @@
+import random
+import tracemalloc
+from individual import Individual
+from pizza import read_setup
+
+
+def make_population(pizza, n_row, n_col, L, H, P):
+    population = []
+    for _ in range(P):
+        A = Individual({}, pizza.slices, n_col, n_row, L, H)
+        A.fill_layout(pizza)
+        population.append(A)
+    return population
+
+
+def make_generation(population, pizza, P):
+    """
+        Simplified version of 'genetic.make_next_generation':
+        the best half survives, the rest are recombinations and mutants of the survivors
+    """
+    mating_pool = sorted(population, reverse=True)[:P // 2]
+    next_generation = list(mating_pool)
+    while len(next_generation) < P:
+        A, B = random.sample(mating_pool, 2)
+        C, D = A.recombine(B, pizza)
+        E = A.copy()
+        E.mutate(pizza, random.choice([1, 2, 3]))
+        next_generation += [C, D, E]
+    return next_generation[:P]
+
+
+def test_individuals_do_not_share_state():
+    random.seed(0)
+    pizza, n_row, n_col, L, H = read_setup("input/test.in")
+    A, B = make_population(pizza, n_row, n_col, L, H, 2)
+    assert A.layout is not B.layout
+    assert A.grid is not B.grid
+
+    C = A.copy()
+    C.mutate(pizza, 3)
+    grid = A.grid.to_array()
+    for (x, y), k in A.layout.items():
+        wi, he = A.slices[k]
+        assert (grid[y:y + he, x:x + wi] == x + y * n_col).all()
+    assert A.n_empty == (grid == -1).sum()
+    assert C.n_empty == (C.grid.to_array() == -1).sum()
+    assert A.check_correctness(pizza) and C.check_correctness(pizza)
+
+
+def test_memory_is_flat_over_generations():
+    """
+        Interpreter free lists and other bounded caches grow during the first generations and then stay,
+        so the growth is measured over a later window of generations only: a leak keeps growing there.
+    """
+    random.seed(0)
+    P, window = 4, 600
+    pizza, n_row, n_col, L, H = read_setup("input/b_small.in")
+    population = make_population(pizza, n_row, n_col, L, H, P)
+    for _ in range(window):
+        population = make_generation(population, pizza, P)
+
+    tracemalloc.start()
+    for _ in range(window):
+        population = make_generation(population, pizza, P)
+    first, _ = tracemalloc.get_traced_memory()
+    for _ in range(window):
+        population = make_generation(population, pizza, P)
+    second, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert second - first < 8 * 1024
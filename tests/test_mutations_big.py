@@ -3,6 +3,7 @@ import codecs
 import json
 import numpy as np
 from individual import Individual
+from pizza import read_setup, generate_possible_slices
 
 
 def i2s(i, d=2):
@@ -10,43 +11,6 @@ def i2s(i, d=2):
     return "0" * (d - len(res)) + res
 
 
-def read_setup(fname):
-    """
-        Reads the setup from the input file 'fname'.
-        pizza -- 2D list of pizza contents
-        n_row, n_col -- number of rows and columns in pizza
-        L -- minimum amount of each ingridient in a slice
-        H -- maximum size of a slice
-    """
-    with codecs.open(fname, 'r') as fin:
-        n_row, n_col, L, H = list(map(int, fin.readline().split()))
-
-        pizza = []
-        for _ in range(n_row):
-            line = fin.readline().strip()
-            pizza.append(line)
-
-    return pizza, n_row, n_col, L, H
-
-
-def generate_possible_slices(L, H):
-    """
-        Generates a list of all possible slices based on L and H.
-        Each slice is encoded as (wi, he) - it's width and height, respectively.
-    """
-    n_min = 2 * L
-    n_max = H
-
-    slices = []
-    for he in range(1, n_max+1):
-        for wi in range(max(1, n_min // he), n_max + 1):
-            if he * wi > n_max:
-                break
-            slices.append((wi, he))
-
-    return slices
-
-
 start = 501
 end = 1001
 
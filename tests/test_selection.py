@@ -0,0 +1,70 @@
+import random
+import numpy as np
+from individual import Individual
+from pizza import Pizza
+from population import Population
+from selection import select, sus
+from genetic import select_parents
+
+
+def test_select_returns_valid_indices():
+    random.seed(0)
+    scores = np.array([5, 1, 9, 3, 7, 7, 2], dtype=np.int64)
+    for method in ['tournament', 'rank', 'sus']:
+        for n in [0, 1, 6, 50]:
+            chosen = select(scores, n, method)
+            assert len(chosen) == n
+            assert ((chosen >= 0) & (chosen < len(scores))).all()
+
+
+def test_select_favours_higher_scores():
+    random.seed(0)
+    scores = np.arange(20, dtype=np.int64) * 10
+    n = 20000
+    for method in ['tournament', 'rank', 'sus']:
+        counts = np.bincount(select(scores, n, method), minlength=len(scores))
+        assert scores[np.argsort(counts)[-5:]].min() >= scores[10]
+        assert counts[-1] > 2 * max(counts[0], 1)
+        assert (counts * scores).sum() / n > scores.mean()
+
+    # The best of two uniformly drawn individuals: P(i) = (2 * i + 1) / mu^2
+    counts = np.bincount(select(scores, n, 'tournament'), minlength=len(scores))
+    expected = n * (2 * np.arange(20) + 1) / 400
+    assert (np.abs(counts - expected) < 5 * np.sqrt(expected) + 5).all()
+
+
+def test_sus_picks_within_expected_bounds():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        weights = rng.random(int(rng.integers(1, 30))) * 10
+        n = int(rng.integers(1, 100))
+        chosen = sus(weights, n, rng)
+        counts = np.bincount(chosen, minlength=len(weights))
+        expected = n * weights / weights.sum()
+        assert len(chosen) == n
+        assert (counts >= np.floor(expected - 1e-9)).all() and (counts <= np.ceil(expected + 1e-9)).all()
+
+    random.seed(0)
+    scores = np.array([100, 101, 103, 100, 110], dtype=np.int64)
+    counts = np.bincount(select(scores, 30, 'sus'), minlength=len(scores))
+    expected = 30 * (scores - scores.min() + 1) / (scores - scores.min() + 1).sum()
+    assert (counts >= np.floor(expected)).all() and (counts <= np.ceil(expected)).all()
+
+
+def test_select_parents_draws_from_the_population():
+    random.seed(0)
+    rng = np.random.default_rng(0)
+    pizza = Pizza(rng.integers(0, 2, (12, 12)).astype(np.uint8), 1, 6)
+    population = Population()
+    for _ in range(8):
+        A = Individual({}, pizza.slices, pizza.n_col, pizza.n_row, pizza.L, pizza.H)
+        A.fill_layout(pizza)
+        population.append(A)
+    population.sort()
+    mating_pool = [population[i] for i in population.top(2)]
+
+    for method in ['truncation', 'tournament', 'rank', 'sus']:
+        pool, pairs, mutated = select_parents(population, mating_pool, 3, 5, method)
+        assert len(pairs) == 3 and len(mutated) == 5
+        for i in [i for pair in pairs for i in pair] + list(mutated):
+            assert 0 <= i < len(pool)
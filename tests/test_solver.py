@@ -0,0 +1,76 @@
+import random
+import numpy as np
+from individual import Individual
+from pizza import Pizza
+from solver import pack_window, solve_region
+
+
+def brute_force(pizza, blocked):
+    """
+        Returns the maximum number of cells used by non-overlapping feasible slices off the blocked cells,
+        trying every subset of the placements
+    """
+    placements = []
+    for y in range(pizza.n_row):
+        for x in range(pizza.n_col):
+            for k in pizza.legal_slices(x, y):
+                wi, he = pizza.slices[k]
+                if not blocked[y:y + he, x:x + wi].any():
+                    placements.append({(i, j) for i in range(x, x + wi) for j in range(y, y + he)})
+
+    def best(i, used):
+        if i == len(placements):
+            return 0
+        value = best(i + 1, used)
+        if not placements[i] & used:
+            value = max(value, len(placements[i]) + best(i + 1, used | placements[i]))
+        return value
+    return best(0, frozenset())
+
+
+def test_pack_window_is_optimal():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        he, wi = rng.integers(1, 5, size=2)
+        L, H = int(rng.integers(1, 3)), int(rng.integers(2, 7))
+        pizza = Pizza(rng.integers(0, 2, (he, wi)).astype(np.uint8), L, H)
+        blocked = rng.random((he, wi)) < 0.2
+
+        solution = pack_window(pizza.feasible, pizza.slices, blocked)
+        used = np.zeros((he, wi), dtype=bool)
+        for i, j, k in solution:
+            s_wi, s_he = pizza.slices[k]
+            assert pizza.feasible[j, i, k]
+            assert i + s_wi <= wi and j + s_he <= he
+            assert not (used | blocked)[j:j + s_he, i:i + s_wi].any()
+            used[j:j + s_he, i:i + s_wi] = True
+        assert used.sum() == brute_force(pizza, blocked)
+
+
+def test_solve_region_keeps_individual_consistent():
+    random.seed(0)
+    rng = np.random.default_rng(1)
+    pizza = Pizza(rng.integers(0, 2, (40, 50)).astype(np.uint8), 1, 6)
+    A = Individual({}, pizza.slices, pizza.n_col, pizza.n_row, pizza.L, pizza.H)
+    A.fill_layout(pizza)
+    A.mutate(pizza) # builds the index of empty cells
+    parent = A.copy()
+
+    gained = 0
+    for _ in range(200):
+        wi, he = random.randint(2, 6), random.randint(2, 6)
+        x0, y0 = random.randrange(pizza.n_col - wi + 1), random.randrange(pizza.n_row - he + 1)
+        score = A.score()
+        gained += solve_region(A, pizza, (x0, y0, x0 + wi, y0 + he))
+        assert A.score() >= score
+    assert gained > 0 and A.score() == parent.score() + gained
+
+    for B in [A, parent]:
+        grid = B.grid.to_array()
+        for (x, y), k in B.layout.items():
+            wi, he = B.slices[k]
+            assert (grid[y:y + he, x:x + wi] == x + y * B.n_col).all()
+        assert B.n_empty == (grid == -1).sum() == len(B.empty_index)
+        assert B.check_correctness(pizza)
+        rebuilt = Individual(dict(B.layout.items()), B.slices, B.n_col, B.n_row, B.L, B.H)
+        assert B.layout_hash == rebuilt.layout_hash and (rebuilt.grid.to_array() == grid).all()